@@ -36,7 +36,7 @@ class GraphBuilder:
         """清理现有图数据"""
         logger.info("清理现有图数据...")
         clear_cypher = "MATCH (n) DETACH DELETE n"
-        success, result = self.executor.execute_transactional_cypher(clear_cypher)
+        success, _ = self.executor.execute_transactional_cypher(clear_cypher, consume_as="none")
         if success:
             logger.info("现有图数据已清理")
         else:
@@ -240,6 +240,7 @@ class GraphBuilder:
     
     def close(self):
         """关闭数据库连接"""
+        self.validator.close()
         if self.executor:
             self.executor.close()
 
@@ -285,20 +286,29 @@ class GraphBuilder:
             logger.info(f"    ✗ 表 {table_name} 没有找到精确匹配的字段组，创建独有字段")
             logger.info(f"      表字段集合: {[f'{name}:{type_}' for name, type_ in table_fields]}")
             
+            # 收集该表尚未创建的独有字段，整表一次批量写入，不再每个字段各执行两条语句
+            new_fields = {}  # {field_key: field}
             for i, col_name in enumerate(column_names):
                 col_type = column_types[i] if i < len(column_types) else "UNKNOWN"
-                description = descriptions[i] if i < len(descriptions) and descriptions[i] else ""
-                sample_data = self.utils.extract_sample_data(sample_rows, col_name)
-                
-                # 创建独有字段
                 field_key = f"{schema_name}.{col_name}:{col_type}:{table_name}"
-                if field_key not in self.all_fields:
-                    if self.node_creator.create_field_node(col_name, col_type, db_name, schema_name, table_name, description, sample_data):
-                        self.all_fields[field_key] = True
-                        # 创建表->独有字段的关系
-                        self.relationship_creator.create_table_has_field_relationship(table_name, col_name, schema_name, field_key)
-                        logger.debug(f"      创建独有字段: {col_name} ({col_type}) -> {table_name}")
-                        unique_fields_count += 1
+                if field_key in self.all_fields or field_key in new_fields:
+                    continue
+                new_fields[field_key] = {
+                    "name": col_name,
+                    "type": col_type,
+                    "description": descriptions[i] if i < len(descriptions) and descriptions[i] else "",
+                    "sample_data": self.utils.extract_sample_data(sample_rows, col_name),
+                }
+            
+            # 创建独有字段，再创建表->独有字段的关系
+            if new_fields and self.node_creator.create_field_nodes(db_name, schema_name, table_name, list(new_fields.values())):
+                for field_key in new_fields:
+                    self.all_fields[field_key] = True
+                self.relationship_creator.create_table_has_field_relationships(
+                    table_name, schema_name, [field["name"] for field in new_fields.values()]
+                )
+                logger.debug(f"      创建独有字段: {len(new_fields)} 个 -> {table_name}")
+                unique_fields_count = len(new_fields)
         
         return shared_fields_count, unique_fields_count
 
@@ -7,12 +7,30 @@ import csv
 import hashlib
 import re
 import logging
-from typing import Dict, List, Optional
+from typing import Dict, FrozenSet, List, Optional
 from collections import defaultdict
+from functools import lru_cache
+from itertools import zip_longest
 
 # 创建带有模块名的logger
 logger = logging.getLogger(__name__)
 
+# 示例数据清理映射表：去除引号、换行转空格、去除回车
+_SAMPLE_TRANS = str.maketrans({"'": "", '"': "", "\n": " ", "\r": ""})
+
+
+@lru_cache(maxsize=65536)
+def _hash_tuples(column_names: tuple, column_types: tuple) -> str:
+    """字段组哈希计算内核（按字段名/类型元组缓存，共享字段组的表只需计算一次）"""
+    # 创建字段组字节串：字段名:类型的组合
+    field_items = [f"{name}:{col_type}".encode() for name, col_type in
+                   zip_longest(column_names, column_types[:len(column_names)], fillvalue="UNKNOWN")]
+    field_items.sort()  # 排序确保一致性
+    
+    h = hashlib.blake2b(digest_size=8)
+    h.update(b"\x1f".join(field_items))
+    return h.hexdigest()
+
 
 class GraphUtils:
     """图构建辅助工具类，提供各种工具方法"""
@@ -20,16 +38,17 @@ class GraphUtils:
     @staticmethod
     def calculate_field_group_hash(column_names: List[str], column_types: List[str]) -> str:
         """计算字段组的哈希值，用于识别相同字段组合"""
-        # 创建字段组字符串：字段名:类型的组合
-        field_items = []
-        for i, name in enumerate(column_names):
-            col_type = column_types[i] if i < len(column_types) else "UNKNOWN"
-            field_items.append(f"{name}:{col_type}")
-        
-        field_str = "|".join(sorted(field_items))  # 排序确保一致性
-        return hashlib.md5(field_str.encode()).hexdigest()
+        return _hash_tuples(tuple(column_names), tuple(column_types))
     
     @staticmethod
+    def materialize_field_set(column_names: List[str], column_types: List[str]) -> FrozenSet[str]:
+        """构建字段组的字段集合（字段名:类型），在字段组创建时计算一次并随group_info复用"""
+        # 多余的类型忽略，缺失的类型记为UNKNOWN
+        return frozenset(f"{name}:{col_type}" for name, col_type in
+                         zip_longest(column_names, column_types[:len(column_names)], fillvalue="UNKNOWN"))
+    
+    @staticmethod
+    @lru_cache(maxsize=65536)
     def generate_field_group_name(representative_table: str, schema_name: str, field_count: int, field_hash: str) -> str:
         """生成字段组名称（使用字段组哈希确保唯一性）"""
         # 移除schema前缀
@@ -62,12 +81,18 @@ class GraphUtils:
             
         try:
             with open(ddl_file_path, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
+                reader = csv.reader(f)
+                header = next(reader, None)
+                if not header or 'table_name' not in header or 'DDL' not in header:
+                    return ddl_info
+
+                # 只用到两列，先从表头解析列位置，再按位置读取
+                ti = header.index('table_name')
+                di = header.index('DDL')
+                min_len = max(ti, di) + 1
                 for row in reader:
-                    table_name = row.get('table_name', '')
-                    ddl = row.get('DDL', '')
-                    if table_name:
-                        ddl_info[table_name] = ddl
+                    if len(row) >= min_len and row[ti]:
+                        ddl_info[row[ti]] = row[di]
         except Exception as e:
             logger.error(f"GraphUtils: 加载DDL文件失败: {e}")
         
@@ -82,7 +107,7 @@ class GraphUtils:
                 value = str(row[column_name])
                 if value and value != "NULL":
                     # 清理和限制样本数据长度，避免特殊字符问题
-                    clean_value = value.replace("'", "").replace('"', "").replace("\n", " ").replace("\r", "")
+                    clean_value = value.translate(_SAMPLE_TRANS)
                     if len(clean_value) > 20:
                         clean_value = clean_value[:20] + "..."
                     samples.append(clean_value)
@@ -109,14 +134,8 @@ class GraphUtils:
         
         for field_hash, group_info in field_groups.items():
             if group_info['schema'] == schema_name:
-                # 构建字段组的字段集合
-                column_names = group_info['column_names']
-                column_types = group_info['column_types']
-                
-                group_field_set = set()
-                for i, col_name in enumerate(column_names):
-                    col_type = column_types[i] if i < len(column_types) else "UNKNOWN"
-                    group_field_set.add(f"{col_name}:{col_type}")
+                # 字段组的字段集合在优化阶段已预先构建
+                group_field_set = group_info['field_set']
                 
                 logger.debug(f"GraphUtils:   检查字段组 {group_info['group_name']} (哈希: {field_hash[:8]}...)")
                 logger.debug(f"GraphUtils:     组字段集合: {sorted(group_field_set)}")
@@ -136,22 +155,22 @@ class GraphUtils:
                                   field_groups: Dict[str, Dict]) -> Optional[str]:
         """查找字段是否属于某个共享字段组，返回字段组名称（如果存在）"""
         logger.debug(f"GraphUtils: 查找字段 {field_name}:{field_type} 在模式 {schema_name} 中的共享字段组")
+        field_item = f"{field_name}:{field_type}"
         
         for field_hash, group_info in field_groups.items():
             if group_info['schema'] == schema_name:
-                # 检查字段是否在这个字段组中
-                column_names = group_info['column_names']
-                column_types = group_info['column_types']
+                # 字段名不在该字段组中时直接跳过
+                if field_name not in group_info['column_names_set']:
+                    continue
                 
                 logger.debug(f"GraphUtils:   检查字段组 {group_info['group_name']} (哈希: {field_hash[:8]}...)")
-                logger.debug(f"GraphUtils:     字段组合: {column_names}")
-                logger.debug(f"GraphUtils:     类型组合: {column_types}")
+                logger.debug(f"GraphUtils:     字段组合: {group_info['column_names']}")
+                logger.debug(f"GraphUtils:     类型组合: {group_info['column_types']}")
                 
-                for i, col_name in enumerate(column_names):
-                    col_type = column_types[i] if i < len(column_types) else "UNKNOWN"
-                    if col_name == field_name and col_type == field_type:
-                        logger.debug(f"GraphUtils:     ✓ 匹配到字段组: {group_info['group_name']}")
-                        return group_info['group_name']
+                # 检查字段是否在这个字段组中（使用预先构建的字段集合）
+                if field_item in group_info['field_set']:
+                    logger.debug(f"GraphUtils:     ✓ 匹配到字段组: {group_info['group_name']}")
+                    return group_info['group_name']
         
         logger.debug(f"GraphUtils: 未找到包含字段 {field_name}:{field_type} 的共享字段组")
         return None
@@ -190,6 +209,7 @@ class FieldGroupOptimizer:
     def _analyze_combinations_by_schema(self, field_groups_data: Dict[str, List]) -> Dict[str, List[Dict]]:
         """按模式分析字段组合"""
         schema_combinations = defaultdict(list)
+        materialize_field_set = GraphUtils.materialize_field_set
         
         for field_hash, tables_with_fields in field_groups_data.items():
             if len(tables_with_fields) > 1:  # 只处理多表共享的字段组
@@ -199,33 +219,33 @@ class FieldGroupOptimizer:
                 
                 if len(column_names) >= 2:  # 只处理多字段组合
                     # 创建字段集合（字段名:类型）
-                    field_set = set()
-                    for i, name in enumerate(column_names):
-                        col_type = column_types[i] if i < len(column_types) else "UNKNOWN"
-                        field_set.add(f"{name}:{col_type}")
+                    field_set = materialize_field_set(column_names, column_types)
+                    tables = [info[0].get('table_name', '') for info in tables_with_fields]
                     
                     combination = {
                         'field_hash': field_hash,
                         'field_set': field_set,
+                        'column_names_set': frozenset(column_names),
                         'field_names': column_names,
                         'field_types': column_types,
                         'schema': representative_schema,
                         'representative_table': representative_table.get('table_name', ''),
                         'table_count': len(tables_with_fields),
                         'field_count': len(column_names),
-                        'tables': [info[0].get('table_name', '') for info in tables_with_fields]
+                        'tables': tables,
+                        'table_set': frozenset(tables)  # 供贪心选择时做覆盖差集，避免逐轮重建集合
                     }
                     schema_combinations[representative_schema].append(combination)
         
-        # 为每个模式按字段数量排序
-        for schema in schema_combinations:
-            schema_combinations[schema].sort(key=lambda x: x['field_count'], reverse=True)
-        
+        # 排序统一在_select_minimal_covering_set中进行，这里保持插入顺序
         return dict(schema_combinations)
     
     def _select_minimal_covering_set(self, schema_name: str, combinations: List[Dict]) -> Dict[str, Dict]:
-        """为单个模式选择最小覆盖字段组集合"""
-        self.logger.info(f"为模式 {schema_name} 选择最小覆盖字段组集合...")
+        """
+        为单个模式选择最小覆盖字段组集合
+        combinations会被原地按(表数量, 字段数量)降序排序，调用方无需预先排序
+        """
+        self.logger.info("为模式 %s 选择最小覆盖字段组集合...", schema_name)
         
         # 使用贪心算法选择最小覆盖集合
         selected_groups = {}
@@ -236,7 +256,7 @@ class FieldGroupOptimizer:
         
         for combo in combinations:
             field_hash = combo['field_hash']
-            combo_tables = set(combo['tables'])
+            combo_tables = combo['table_set']
             
             # 检查是否与已选择的字段组有冲突
             has_conflict = False
@@ -256,23 +276,25 @@ class FieldGroupOptimizer:
                 if len(new_tables) > 0:  # 只选择能覆盖新表的字段组
                     selected_groups[field_hash] = {
                         'field_set': combo['field_set'],
+                        'column_names_set': combo['column_names_set'],
                         'group_name': self._generate_optimized_group_name(combo),
                         'schema': combo['schema'],
                         'column_names': combo['field_names'],
                         'column_types': combo['field_types'],
                         'table_count': combo['table_count'],
                         'field_count': combo['field_count'],
-                        'tables': combo['tables']
+                        'tables': combo['tables'],
+                        'table_set': combo_tables
                     }
                     covered_tables.update(combo_tables)
-                    self.logger.info(f"  ✓ 选择字段组: {field_hash[:8]}... ({combo['field_count']}字段 x {combo['table_count']}表)")
-                    self.logger.info(f"    新增覆盖表: {len(new_tables)} 个")
+                    self.logger.info("  ✓ 选择字段组: %s... (%d字段 x %d表)", field_hash[:8], combo['field_count'], combo['table_count'])
+                    self.logger.info("    新增覆盖表: %d 个", len(new_tables))
                 else:
-                    self.logger.info(f"  ✗ 跳过字段组: {field_hash[:8]}... (不覆盖新表)")
+                    self.logger.info("  ✗ 跳过字段组: %s... (不覆盖新表)", field_hash[:8])
             else:
-                self.logger.info(f"  ✗ 跳过字段组: {field_hash[:8]}... (与已选字段组冲突)")
+                self.logger.info("  ✗ 跳过字段组: %s... (与已选字段组冲突)", field_hash[:8])
         
-        self.logger.info(f"模式 {schema_name} 选择了 {len(selected_groups)} 个字段组，覆盖 {len(covered_tables)} 个表")
+        self.logger.info("模式 %s 选择了 %d 个字段组，覆盖 %d 个表", schema_name, len(selected_groups), len(covered_tables))
         return selected_groups
     
     def _validate_exact_matching(self, optimal_groups: Dict[str, Dict], original_data: Dict[str, List]):
@@ -290,28 +312,25 @@ class FieldGroupOptimizer:
             original_tables = original_data.get(field_hash, [])
             for table_info, schema_name, _ in original_tables:
                 table_name = table_info.get('table_name', '')
-                column_names = table_info.get('column_names', [])
-                column_types = table_info.get('column_types', [])
                 
                 # 构建这个表的字段集合
-                table_field_set = set()
-                for i, name in enumerate(column_names):
-                    col_type = column_types[i] if i < len(column_types) else "UNKNOWN"
-                    table_field_set.add(f"{name}:{col_type}")
+                table_field_set = GraphUtils.materialize_field_set(
+                    table_info.get('column_names', []), table_info.get('column_types', [])
+                )
                 
                 # 验证字段集合是否完全匹配
                 if table_field_set != group_field_set:
                     validation_errors.append(
                         f"表 {table_name} 的字段集合与字段组 {group_info['group_name']} 不完全匹配"
                     )
-                    self.logger.warning(f"  字段集合不匹配: {table_name}")
-                    self.logger.warning(f"    表字段: {sorted(table_field_set)}")
-                    self.logger.warning(f"    组字段: {sorted(group_field_set)}")
+                    self.logger.warning("  字段集合不匹配: %s", table_name)
+                    self.logger.warning("    表字段: %s", sorted(table_field_set))
+                    self.logger.warning("    组字段: %s", sorted(group_field_set))
         
         if validation_errors:
-            self.logger.error(f"发现 {len(validation_errors)} 个精确匹配验证错误")
+            self.logger.error("发现 %d 个精确匹配验证错误", len(validation_errors))
             for error in validation_errors:
-                self.logger.error(f"  {error}")
+                self.logger.error("  %s", error)
             return False
         else:
             self.logger.info("✓ 精确字段集合匹配验证通过")
@@ -344,6 +363,8 @@ class FieldGroupOptimizer:
     def _analyze_field_combinations(self, field_groups_data: Dict[str, List]) -> List[Dict]:
         """分析所有字段组合"""
         combinations = []
+        append = combinations.append
+        materialize_field_set = GraphUtils.materialize_field_set
         
         for field_hash, tables_with_fields in field_groups_data.items():
             if len(tables_with_fields) > 1:  # 只处理多表共享的字段组
@@ -353,14 +374,12 @@ class FieldGroupOptimizer:
                 
                 if len(column_names) >= 2:  # 只处理多字段组合
                     # 创建字段集合（字段名:类型）
-                    field_set = set()
-                    for i, name in enumerate(column_names):
-                        col_type = column_types[i] if i < len(column_types) else "UNKNOWN"
-                        field_set.add(f"{name}:{col_type}")
+                    field_set = materialize_field_set(column_names, column_types)
                     
                     combination = {
                         'field_hash': field_hash,
                         'field_set': field_set,
+                        'column_names_set': frozenset(column_names),
                         'field_names': column_names,
                         'field_types': column_types,
                         'schema': representative_schema,
@@ -369,14 +388,15 @@ class FieldGroupOptimizer:
                         'field_count': len(column_names),
                         'tables': [info[0].get('table_name', '') for info in tables_with_fields]
                     }
-                    combinations.append(combination)
+                    append(combination)
         
         # 按字段数量降序，表数量降序排序
         combinations.sort(key=lambda x: (x['field_count'], x['table_count']), reverse=True)
         
-        self.logger.info(f"分析到 {len(combinations)} 个字段组合")
-        for combo in combinations:
-            self.logger.info(f"  {combo['field_hash'][:8]}... : {combo['field_count']}字段 x {combo['table_count']}表")
+        self.logger.info("分析到 %d 个字段组合", len(combinations))
+        if self.logger.isEnabledFor(logging.INFO):
+            for combo in combinations:
+                self.logger.info("  %s... : %d字段 x %d表", combo['field_hash'][:8], combo['field_count'], combo['table_count'])
         
         return combinations
     
@@ -408,17 +428,19 @@ class FieldGroupOptimizer:
                         # A 和 B 重叠
                         containment_graph[hash_a]['overlaps'].append(hash_b)
         
-        # 打印包含关系分析
-        self.logger.info("字段组包含关系分析:")
-        for hash_key, relations in containment_graph.items():
-            combo = next(c for c in combinations if c['field_hash'] == hash_key)
-            self.logger.info(f"  {hash_key[:8]}... ({combo['field_count']}字段):")
-            if relations['contains']:
-                self.logger.info(f"    包含: {len(relations['contains'])} 个字段组")
-            if relations['contained_by']:
-                self.logger.info(f"    被包含: {len(relations['contained_by'])} 个字段组")
-            if relations['overlaps']:
-                self.logger.info(f"    重叠: {len(relations['overlaps'])} 个字段组")
+        # 打印包含关系分析（INFO未启用时跳过整个多行日志块）
+        if self.logger.isEnabledFor(logging.INFO):
+            by_hash = {c['field_hash']: c for c in combinations}
+            self.logger.info("字段组包含关系分析:")
+            for hash_key, relations in containment_graph.items():
+                combo = by_hash[hash_key]
+                self.logger.info("  %s... (%d字段):", hash_key[:8], combo['field_count'])
+                if relations['contains']:
+                    self.logger.info("    包含: %d 个字段组", len(relations['contains']))
+                if relations['contained_by']:
+                    self.logger.info("    被包含: %d 个字段组", len(relations['contained_by']))
+                if relations['overlaps']:
+                    self.logger.info("    重叠: %d 个字段组", len(relations['overlaps']))
         
         return containment_graph
     
@@ -453,6 +475,8 @@ class FieldGroupOptimizer:
             
             if can_select:
                 selected_groups[field_hash] = {
+                    'field_set': combo['field_set'],
+                    'column_names_set': combo['column_names_set'],
                     'group_name': self._generate_optimized_group_name(combo),
                     'schema': combo['schema'],
                     'column_names': combo['field_names'],
@@ -462,11 +486,11 @@ class FieldGroupOptimizer:
                     'tables': combo['tables']
                 }
                 selected_hashes.add(field_hash)
-                self.logger.info(f"  ✓ 选择字段组: {field_hash[:8]}... ({combo['field_count']}字段 x {combo['table_count']}表)")
+                self.logger.info("  ✓ 选择字段组: %s... (%d字段 x %d表)", field_hash[:8], combo['field_count'], combo['table_count'])
             else:
-                self.logger.info(f"  ✗ 跳过字段组: {field_hash[:8]}... ({conflict_reason})")
+                self.logger.info("  ✗ 跳过字段组: %s... (%s)", field_hash[:8], conflict_reason)
         
-        self.logger.info(f"最终选择了 {len(selected_groups)} 个不重叠字段组")
+        self.logger.info("最终选择了 %d 个不重叠字段组", len(selected_groups))
         return selected_groups
     
     def _generate_optimized_group_name(self, combo: Dict) -> str:
@@ -503,26 +527,25 @@ class FieldGroupOptimizer:
         original_table_count = sum(len(tables) for tables in original_data.values() if len(tables) > 1)
         optimized_table_count = sum(group['table_count'] for group in optimal_groups.values())
         
-        self.logger.info(f"  原始覆盖表数: {original_table_count}")
-        self.logger.info(f"  优化后覆盖表数: {optimized_table_count}")
+        self.logger.info("  原始覆盖表数: %d", original_table_count)
+        self.logger.info("  优化后覆盖表数: %d", optimized_table_count)
         if original_table_count > 0:
-            self.logger.info(f"  覆盖率: {optimized_table_count/original_table_count*100:.1f}%")
+            self.logger.info("  覆盖率: %.1f%%", optimized_table_count / original_table_count * 100)
         
         # 检查字段组重叠
-        all_field_sets = []
-        for group in optimal_groups.values():
-            field_set = set()
-            for i, name in enumerate(group['column_names']):
-                col_type = group['column_types'][i] if i < len(group['column_types']) else "UNKNOWN"
-                field_set.add(f"{name}:{col_type}")
-            all_field_sets.append(field_set)
-        
-        has_overlap = False
-        for i, set_a in enumerate(all_field_sets):
-            for j, set_b in enumerate(all_field_sets):
-                if i < j and len(set_a.intersection(set_b)) > 0:
-                    has_overlap = True
-                    self.logger.warning(f"  发现重叠: 字段组{i} 和 字段组{j}")
+        all_field_sets = [group['field_set'] for group in optimal_groups.values()]
+        
+        # 倒排索引：字段 -> 包含该字段的字段组下标，出现在同一倒排列表中的字段组即重叠
+        postings = defaultdict(list)
+        for i, field_set in enumerate(all_field_sets):
+            for item in field_set:
+                postings[item].append(i)
+        
+        overlaps = {(i, j) for group_ids in postings.values() if len(group_ids) >= 2
+                    for i in group_ids for j in group_ids if i < j}
+        for i, j in sorted(overlaps):
+            self.logger.warning("  发现重叠: 字段组%d 和 字段组%d", i, j)
+        has_overlap = bool(overlaps)
         
         if not has_overlap:
             self.logger.info("  ✓ 验证通过: 所有字段组都不重叠")
@@ -2,17 +2,194 @@
 图验证器模块
 负责验证图数据的完整性和提供统计信息
 """
-import sys
-import os
 import logging
-from typing import Dict
-
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Tuple
 
 from utils.CypherExecutor import CypherExecutor
 
+
+class _PrefixAdapter(logging.LoggerAdapter):
+    """为日志消息统一加上 "GraphValidator: " 前缀"""
+    
+    def process(self, msg, kwargs):
+        return f"GraphValidator: {msg}", kwargs
+
+
 # 创建带有模块名的logger
-logger = logging.getLogger(__name__)
+logger = _PrefixAdapter(logging.getLogger(__name__), {})
+
+# 统计的节点类型和关系类型（标签无法参数化，因此在模块加载时一次性拼接成固定查询）
+# 单标签计数和单类型关系计数由Neo4j计数存储直接返回（NodeCountFromCountStore/RelationshipCountFromCountStore），
+# 不会扫描节点或关系，无需依赖APOC的apoc.meta.stats。
+# 全部类型已在服务端一次往返内枚举完毕；改用UNWIND + apoc.cypher.run动态拼接标签反而会绕过计数存储
+_NODE_TYPES = ("Database", "Schema", "Table", "Column", "SharedFieldGroup", "Field")
+_RELATIONSHIP_TYPES = ("HAS_SCHEMA", "HAS_TABLE", "USES_FIELD_GROUP", "HAS_FIELD", "HAS_UNIQUE_FIELD")
+
+_STATS_CYPHER = "\nUNION ALL\n".join(
+    [f"MATCH (n:{node_type}) RETURN '{node_type}' AS key, COUNT(n) AS count" for node_type in _NODE_TYPES]
+    + [f"MATCH ()-[r:{rel_type}]->() RETURN '{rel_type}_Relationships' AS key, COUNT(r) AS count"
+       for rel_type in _RELATIONSHIP_TYPES]
+    + [
+        # 总关系数
+        "MATCH ()-[r]->() RETURN 'Total_Relationships' AS key, COUNT(r) AS count",
+        # 不同类型的字段数
+        "MATCH (f:Field) WHERE f.node_type = $shared_node_type RETURN 'Shared_Fields' AS key, COUNT(f) AS count",
+        "MATCH (f:Field) WHERE f.node_type = $unique_node_type RETURN 'Unique_Fields' AS key, COUNT(f) AS count",
+    ]
+)
+_STATS_PARAMS = {"shared_node_type": "shared_field", "unique_node_type": "unique_field"}
+_STATS_KEYS = (
+    list(_NODE_TYPES)
+    + [f"{rel_type}_Relationships" for rel_type in _RELATIONSHIP_TYPES]
+    + ["Total_Relationships", "Shared_Fields", "Unique_Fields"]
+)
+
+
+# 图完整性检查：每项检查为UNION ALL中的一个分支，统一返回问题类型kind和问题详情detail(map)。
+# "不存在某关系"类检查用OPTIONAL MATCH + IS NULL过滤实现；每个分支的输出上限见 _ALL_CHECKS，图损坏严重时也不会刷屏
+
+# 1. 只被一个表使用的SharedFieldGroup
+_CYPHER_SINGLE_USE_GROUPS = """
+MATCH (sfg:SharedFieldGroup)<-[:USES_FIELD_GROUP]-(t:Table)
+WITH sfg, COUNT(t) as table_count
+WHERE table_count = 1
+RETURN 'single_use_group' AS kind, {group_name: sfg.name, table_count: table_count} AS detail
+"""
+
+# 2. 没有Field节点的SharedFieldGroup
+_CYPHER_EMPTY_GROUPS = """
+MATCH (sfg:SharedFieldGroup)
+OPTIONAL MATCH (sfg)-[:HAS_FIELD]->(f:Field)
+WITH sfg, f WHERE f IS NULL
+RETURN 'empty_group' AS kind, {group_name: sfg.name} AS detail
+"""
+
+# 2.1 字段数量小于2的SharedFieldGroup（不符合"组"的定义）
+_CYPHER_INSUFFICIENT_FIELDS_GROUPS = """
+MATCH (sfg:SharedFieldGroup)-[:HAS_FIELD]->(f:Field)
+WITH sfg, COUNT(f) as field_count
+WHERE field_count < 2
+RETURN 'insufficient_fields_group' AS kind, {group_name: sfg.name, field_count: field_count} AS detail
+"""
+
+# 3. 没有任何字段连接的表
+_CYPHER_TABLES_WITHOUT_FIELDS = """
+MATCH (t:Table)
+OPTIONAL MATCH (t)-[:USES_FIELD_GROUP]->(sfg:SharedFieldGroup)
+WITH t, sfg WHERE sfg IS NULL
+OPTIONAL MATCH (t)-[:HAS_UNIQUE_FIELD]->(f:Field)
+WITH t, f WHERE f IS NULL
+RETURN 'table_without_fields' AS kind, {table_name: t.name} AS detail
+"""
+
+# 4. 孤立的Field节点（没有被任何组或表引用）
+_CYPHER_ORPHANED_FIELDS = """
+MATCH (f:Field)
+OPTIONAL MATCH (sfg:SharedFieldGroup)-[:HAS_FIELD]->(f)
+WITH f, sfg WHERE sfg IS NULL
+OPTIONAL MATCH (t:Table)-[:HAS_UNIQUE_FIELD]->(f)
+WITH f, t WHERE t IS NULL
+RETURN 'orphaned_field' AS kind,
+       {field_name: f.name, schema: f.schema, node_type: f.node_type, table_name: f.table} AS detail
+"""
+
+# 4.1 同时被SharedFieldGroup和Table直接引用的字段（重复连接）
+_CYPHER_DUPLICATE_REFERENCES = """
+MATCH (f:Field)<-[:HAS_FIELD]-(sfg:SharedFieldGroup),
+      (f)<-[:HAS_UNIQUE_FIELD]-(t:Table)
+RETURN 'duplicate_reference' AS kind,
+       {field_name: f.name, schema: f.schema, node_type: f.node_type, field_table: f.table,
+        group_name: sfg.name, table_name: t.name} AS detail
+"""
+
+# 4.2 被多个SharedFieldGroup引用的字段（违反独立性原则）
+_CYPHER_MULTI_GROUP_REFERENCES = """
+MATCH (f:Field)<-[:HAS_FIELD]-(sfg:SharedFieldGroup)
+WITH f, COUNT(sfg) as group_count, COLLECT(sfg.name) as group_names
+WHERE group_count > 1
+RETURN 'multi_group_reference' AS kind,
+       {field_name: f.name, schema: f.schema, expected_group: f.field_group, field_table: f.table,
+        group_count: group_count, group_names: group_names} AS detail
+"""
+
+
+def _field_identifier(detail: Dict, table_key: str) -> str:
+    """拼接字段标识：schema.字段名，带表名时附加表信息"""
+    field_identifier = f"{detail['schema']}.{detail['field_name']}"
+    if detail.get(table_key):
+        field_identifier += f" (表: {detail[table_key]})"
+    return field_identifier
+
+
+def _format_orphaned_field(detail: Dict) -> str:
+    """孤立字段只有独有字段才附加表名"""
+    node_type = detail.get('node_type', 'unknown')
+    table_name = detail.get('table_name', 'unknown')
+    field_identifier = f"{detail['schema']}.{detail['field_name']}"
+    if node_type == 'unique_field' and table_name:
+        field_identifier += f" (表: {table_name})"
+    return f"❌ 孤立字段 '{field_identifier}' ({node_type}) 没有被引用"
+
+
+# (问题类型, 检查查询, 问题格式化函数, 最多列出的问题数)，新增检查只需在此追加一项
+_ALL_CHECKS: List[Tuple[str, str, Callable[[Dict], str], int]] = [
+    ('single_use_group', _CYPHER_SINGLE_USE_GROUPS,
+     lambda d: f"⚠️  共享字段组 '{d['group_name']}' 只被 1 个表使用", 500),
+    ('empty_group', _CYPHER_EMPTY_GROUPS,
+     lambda d: f"❌ 共享字段组 '{d['group_name']}' 没有字段节点", 100),
+    ('insufficient_fields_group', _CYPHER_INSUFFICIENT_FIELDS_GROUPS,
+     lambda d: f"❌ 共享字段组 '{d['group_name']}' 只有 {d['field_count']} 个字段，不符合群组定义", 500),
+    ('table_without_fields', _CYPHER_TABLES_WITHOUT_FIELDS,
+     lambda d: f"❌ 表 '{d['table_name']}' 没有字段连接", 100),
+    ('orphaned_field', _CYPHER_ORPHANED_FIELDS, _format_orphaned_field, 100),
+    ('duplicate_reference', _CYPHER_DUPLICATE_REFERENCES,
+     lambda d: f"❌ 字段 '{_field_identifier(d, 'field_table')}' 同时被共享字段组 '{d['group_name']}' 和表 '{d['table_name']}' 引用", 500),
+    ('multi_group_reference', _CYPHER_MULTI_GROUP_REFERENCES,
+     lambda d: f"❌ 字段 '{_field_identifier(d, 'field_table')}' 被 {d['group_count']} 个字段组引用: {d['group_names']}，但应该只属于: {d.get('expected_group', 'unknown')}", 500),
+]
+
+# 每项检查多取一行：返回行数超过上限即说明结果被截断
+_CHECK_QUERIES: Dict[str, str] = {
+    kind: f"{cypher}LIMIT {limit + 1}\n" for kind, cypher, _, limit in _ALL_CHECKS
+}
+_CHECK_LIMITS: Dict[str, int] = {kind: limit for kind, _, _, limit in _ALL_CHECKS}
+
+# 所有检查合并为一次UNION ALL查询，一次往返完成全部检查
+_INTEGRITY_CYPHER = "UNION ALL".join(_CHECK_QUERIES.values())
+_ISSUE_FORMATTERS: Dict[str, Callable[[Dict], str]] = {kind: formatter for kind, _, formatter, _ in _ALL_CHECKS}
+
+# 图摘要示例查询
+# 查询所有数据库
+_CYPHER_DATABASES = "MATCH (d:Database) RETURN d.name AS database ORDER BY d.name"
+
+# 查询共享字段组及其使用的表
+_CYPHER_TOP_SHARED_GROUPS = """
+MATCH (sfg:SharedFieldGroup)<-[:USES_FIELD_GROUP]-(t:Table)
+RETURN sfg.name AS field_group, 
+       COUNT(t) AS table_count,
+       COLLECT(t.name)[..5] AS sample_tables
+ORDER BY table_count DESC
+LIMIT 5
+"""
+
+# 查询字段组的字段分布
+_CYPHER_FIELD_GROUP_DISTRIBUTION = """
+MATCH (sfg:SharedFieldGroup)-[:HAS_FIELD]->(f:Field)
+RETURN sfg.name AS field_group, COUNT(f) AS field_count
+ORDER BY field_count DESC
+LIMIT 5
+"""
+
+# 查询独有字段的表
+_CYPHER_UNIQUE_FIELD_TABLES = """
+MATCH (t:Table)-[:HAS_UNIQUE_FIELD]->(f:Field)
+RETURN t.name AS table_name, COUNT(f) AS unique_field_count
+ORDER BY unique_field_count DESC
+LIMIT 5
+"""
 
 
 class GraphValidator:
@@ -25,249 +202,176 @@ class GraphValidator:
             executor: Cypher执行器实例
         """
         self.executor = executor
+        self._query_pool = None  # 并发只读查询线程池，首次使用时创建
+        # 统计缓存：(写入代数, 缓存时间, 统计结果)，写入代数变化或超过有效期时重新查询。
+        # 写入代数只反映本进程内的写入，其他进程写入后缓存可能过期，因此默认不缓存，
+        # 调用方确认图数据不会被外部修改时可设置有效期（秒）启用
+        self._stats_cache = None
+        self.stats_cache_ttl = 0
+        self._indexes_checked = False  # 首次查询前确认一次索引
+    
+    def _ensure_indexes(self):
+        """首次查询前确保验证查询依赖的索引存在"""
+        if not self._indexes_checked:
+            self._indexes_checked = True
+            self.executor.ensure_indexes()
+    
+    def _get_query_pool(self) -> ThreadPoolExecutor:
+        """获取并发查询线程池（线程长期复用，各线程缓存的会话也随之复用）"""
+        if self._query_pool is None:
+            self._query_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="GraphValidator")
+        return self._query_pool
+    
+    def close(self):
+        """关闭并发查询线程池"""
+        if self._query_pool is not None:
+            self._query_pool.shutdown(wait=True)
+            self._query_pool = None
     
     def validate_graph_integrity(self) -> bool:
         """验证图的完整性，检查可能的建模问题"""
-        logger.info("GraphValidator: 开始验证图数据完整性...")
-        
-        issues_found = []
+        logger.info("开始验证图数据完整性...")
+        self._ensure_indexes()
         
-        # 1. 检查是否有只被一个表使用的SharedFieldGroup
-        single_use_groups_cypher = """
-        MATCH (sfg:SharedFieldGroup)<-[:USES_FIELD_GROUP]-(t:Table)
-        WITH sfg, COUNT(t) as table_count
-        WHERE table_count = 1
-        RETURN sfg.name AS group_name, table_count
-        """
-        success, result = self.executor.execute_transactional_cypher(single_use_groups_cypher)
-        if success and result:
-            for record in result:
-                issues_found.append(f"⚠️  共享字段组 '{record['group_name']}' 只被 1 个表使用")
-        
-        # 2. 检查是否有SharedFieldGroup没有Field节点
-        empty_groups_cypher = """
-        MATCH (sfg:SharedFieldGroup)
-        WHERE NOT EXISTS((sfg)-[:HAS_FIELD]->(:Field))
-        RETURN sfg.name AS group_name
-        """
-        success, result = self.executor.execute_transactional_cypher(empty_groups_cypher)
-        if success and result:
-            for record in result:
-                issues_found.append(f"❌ 共享字段组 '{record['group_name']}' 没有字段节点")
-        
-        # 2.1 检查是否有SharedFieldGroup字段数量小于2（不符合"组"的定义）
-        insufficient_fields_groups_cypher = """
-        MATCH (sfg:SharedFieldGroup)-[:HAS_FIELD]->(f:Field)
-        WITH sfg, COUNT(f) as field_count
-        WHERE field_count < 2
-        RETURN sfg.name AS group_name, field_count
-        """
-        success, result = self.executor.execute_transactional_cypher(insufficient_fields_groups_cypher)
-        if success and result:
-            for record in result:
-                issues_found.append(f"❌ 共享字段组 '{record['group_name']}' 只有 {record['field_count']} 个字段，不符合群组定义")
-        
-        # 3. 检查是否有表没有任何字段连接
-        tables_without_fields_cypher = """
-        MATCH (t:Table)
-        WHERE NOT EXISTS((t)-[:USES_FIELD_GROUP]->(:SharedFieldGroup)) 
-          AND NOT EXISTS((t)-[:HAS_UNIQUE_FIELD]->(:Field))
-        RETURN t.name AS table_name
-        """
-        success, result = self.executor.execute_transactional_cypher(tables_without_fields_cypher)
-        if success and result:
-            for record in result:
-                issues_found.append(f"❌ 表 '{record['table_name']}' 没有字段连接")
-        
-        # 4. 检查字段是否有孤立的Field节点（没有被任何组或表引用）
-        orphaned_fields_cypher = """
-        MATCH (f:Field)
-        WHERE NOT EXISTS((:SharedFieldGroup)-[:HAS_FIELD]->(f)) 
-          AND NOT EXISTS((:Table)-[:HAS_UNIQUE_FIELD]->(f))
-        RETURN f.name AS field_name, f.schema AS schema, f.node_type AS node_type, f.table AS table_name
-        """
-        success, result = self.executor.execute_transactional_cypher(orphaned_fields_cypher)
-        if success and result:
-            for record in result:
-                node_type = record.get('node_type', 'unknown')
-                table_name = record.get('table_name', 'unknown')
-                field_identifier = f"{record['schema']}.{record['field_name']}"
-                if node_type == 'unique_field' and table_name:
-                    field_identifier += f" (表: {table_name})"
-                issues_found.append(f"❌ 孤立字段 '{field_identifier}' ({node_type}) 没有被引用")
+        # 结果在事务提交后才取回（每个分支都有LIMIT，结果集很小），事务重试时不会重复收集
+        success, result = self.executor.execute_transactional_read(_INTEGRITY_CYPHER)
+        failed_checks = []
+        if success:
+            records = result
+        else:
+            # 合并查询中任一分支出错都会使整条查询失败，退回逐项执行，其余检查仍然有效
+            logger.warning("合并的完整性检查查询执行失败，改为逐项检查")
+            records = []
+            for kind, cypher in _CHECK_QUERIES.items():
+                check_success, check_result = self.executor.execute_transactional_read(cypher)
+                if check_success:
+                    records.extend(check_result)
+                else:
+                    failed_checks.append(kind)
         
-        # 4.1 检查是否有字段同时被SharedFieldGroup和Table直接引用（重复连接）
-        duplicate_references_cypher = """
-        MATCH (f:Field)<-[:HAS_FIELD]-(sfg:SharedFieldGroup),
-              (f)<-[:HAS_UNIQUE_FIELD]-(t:Table)
-        RETURN f.name AS field_name, f.schema AS schema, f.node_type AS node_type, f.table AS field_table,
-               sfg.name AS group_name, t.name AS table_name
-        """
-        success, result = self.executor.execute_transactional_cypher(duplicate_references_cypher)
-        if success and result:
-            for record in result:
-                field_table = record.get('field_table', 'unknown')
-                field_identifier = f"{record['schema']}.{record['field_name']}"
-                if field_table:
-                    field_identifier += f" (表: {field_table})"
-                issues_found.append(f"❌ 字段 '{field_identifier}' 同时被共享字段组 '{record['group_name']}' 和表 '{record['table_name']}' 引用")
+        # 问题详情为(问题类型, 问题详情)，描述推迟到输出日志时才格式化，日志关闭时完全跳过；
+        # 超出上限的多余一行只用于判断截断，不计入问题列表
+        issues_found = []
+        kind_counts = defaultdict(int)
+        truncated = []
+        for record in records:
+            kind = record['kind']
+            kind_counts[kind] += 1
+            if kind_counts[kind] > _CHECK_LIMITS[kind]:
+                truncated.append(kind)
+                continue
+            issues_found.append((kind, record['detail']))
         
-        # 4.2 检查是否有字段被多个SharedFieldGroup引用（违反独立性原则）
-        multi_group_references_cypher = """
-        MATCH (f:Field)<-[:HAS_FIELD]-(sfg:SharedFieldGroup)
-        WITH f, COUNT(sfg) as group_count, COLLECT(sfg.name) as group_names
-        WHERE group_count > 1
-        RETURN f.name AS field_name, f.schema AS schema, f.field_group AS expected_group, f.table AS field_table,
-               group_count, group_names
-        """
-        success, result = self.executor.execute_transactional_cypher(multi_group_references_cypher)
-        if success and result:
-            for record in result:
-                field_name = record['field_name']
-                schema = record['schema']
-                field_table = record.get('field_table', 'unknown')
-                expected_group = record.get('expected_group', 'unknown')
-                group_count = record['group_count']
-                group_names = record['group_names']
-                field_identifier = f"{schema}.{field_name}"
-                if field_table:
-                    field_identifier += f" (表: {field_table})"
-                issues_found.append(f"❌ 字段 '{field_identifier}' 被 {group_count} 个字段组引用: {group_names}，但应该只属于: {expected_group}")
+        if failed_checks:
+            logger.error(f"以下完整性检查执行失败，无法确认图数据完整性: {failed_checks}")
         
         # 报告验证结果
-        if issues_found:
-            logger.warning(f"GraphValidator: 发现 {len(issues_found)} 个潜在问题：")
-            for issue in issues_found:
-                logger.warning(f"GraphValidator: {issue}")
-            return False
-        else:
-            logger.info("GraphValidator: 图数据完整性验证通过")
+        if not issues_found:
+            if failed_checks:
+                return False
+            logger.info("图数据完整性验证通过")
             return True
+        
+        if logger.isEnabledFor(logging.WARNING):
+            issues = [self._format_issue(kind, detail) for kind, detail in issues_found]
+            logger.warning(f"发现 {len(issues)} 个潜在问题：")
+            for issue in issues:
+                logger.warning(issue)
+            for kind in truncated:
+                logger.warning(f"检查 '{kind}' 的问题数超过上限 {_CHECK_LIMITS[kind]}，只列出了前 {_CHECK_LIMITS[kind]} 个，实际问题更多")
+        return False
+    
+    @staticmethod
+    def _format_issue(kind: str, record: Dict) -> str:
+        """将完整性检查返回的问题详情格式化为问题描述"""
+        formatter = _ISSUE_FORMATTERS.get(kind)
+        if formatter is None:
+            return f"❌ 未知问题类型 '{kind}': {record}"
+        return formatter(record)
     
     def get_graph_statistics(self) -> Dict[str, int]:
-        """获取图统计信息（包含共享字段组建模）"""
-        stats = {}
-        
-        # 统计各种节点类型
-        node_types = ["Database", "Schema", "Table", "Column", "SharedFieldGroup", "Field"]
-        for node_type in node_types:
-            count_cypher = f"MATCH (n:{node_type}) RETURN COUNT(n) AS count"
-            success, result = self.executor.execute_transactional_cypher(count_cypher)
-            if success and result:
-                stats[node_type] = result[0].get('count', 0)
-            else:
-                stats[node_type] = 0
+        """获取图统计信息（包含共享字段组建模），结果在图数据未变化时缓存复用"""
+        self._ensure_indexes()
+        generation = self.executor.write_generation
+        if self.stats_cache_ttl > 0 and self._stats_cache is not None:
+            cached_generation, cached_at, cached_stats = self._stats_cache
+            if cached_generation == generation and time.monotonic() - cached_at < self.stats_cache_ttl:
+                return dict(cached_stats)
         
-        # 统计各种关系数量
-        relationship_types = ["HAS_SCHEMA", "HAS_TABLE", "USES_FIELD_GROUP", "HAS_FIELD", "HAS_UNIQUE_FIELD"]
-        for rel_type in relationship_types:
-            rel_cypher = f"MATCH ()-[r:{rel_type}]->() RETURN COUNT(r) AS count"
-            success, result = self.executor.execute_transactional_cypher(rel_cypher)
-            if success and result:
-                stats[f'{rel_type}_Relationships'] = result[0].get('count', 0)
-            else:
-                stats[f'{rel_type}_Relationships'] = 0
+        # 统计各种节点类型和关系数量，使用预先构建的同一条查询，命中Neo4j执行计划缓存
+        stats = dict.fromkeys(_STATS_KEYS, 0)
         
-        # 总关系数
-        total_rel_cypher = "MATCH ()-[r]->() RETURN COUNT(r) AS count"
-        success, result = self.executor.execute_transactional_cypher(total_rel_cypher)
+        success, result = self.executor.execute_transactional_read(_STATS_CYPHER, _STATS_PARAMS)
         if success and result:
-            stats['Total_Relationships'] = result[0].get('count', 0)
-        else:
-            stats['Total_Relationships'] = 0
+            for record in result:
+                stats[record['key']] = record.get('count', 0)
+            self._stats_cache = (generation, time.monotonic(), dict(stats))
         
         return stats
     
     def print_graph_summary(self):
-        """打印图摘要信息（共享字段组建模）"""
-        logger.info("=== 图数据库摘要 (共享字段组建模) ===")
-        stats = self.get_graph_statistics()
-        
-        # 统计不同类型的字段
-        shared_fields_cypher = "MATCH (f:Field) WHERE f.node_type = 'shared_field' RETURN COUNT(f) AS count"
-        success, result = self.executor.execute_transactional_cypher(shared_fields_cypher)
-        shared_fields_count = result[0].get('count', 0) if success and result else 0
-        
-        unique_fields_cypher = "MATCH (f:Field) WHERE f.node_type = 'unique_field' RETURN COUNT(f) AS count"
-        success, result = self.executor.execute_transactional_cypher(unique_fields_cypher)
-        unique_fields_count = result[0].get('count', 0) if success and result else 0
+        """打印图摘要信息（共享字段组建模），所有行汇总后一次写入日志"""
+        if not logger.isEnabledFor(logging.INFO):
+            return
         
-        logger.info("GraphValidator: 节点统计:")
-        logger.info(f"GraphValidator:   数据库: {stats.get('Database', 0)}")
-        logger.info(f"GraphValidator:   模式: {stats.get('Schema', 0)}")
-        logger.info(f"GraphValidator:   表: {stats.get('Table', 0)}")
-        logger.info(f"GraphValidator:   共享字段组: {stats.get('SharedFieldGroup', 0)}")
-        logger.info(f"GraphValidator:   共享字段: {shared_fields_count}")
-        logger.info(f"GraphValidator:   独有字段: {unique_fields_count}")
-        logger.info(f"GraphValidator:   字段总数: {stats.get('Field', 0)}")
-        logger.info(f"GraphValidator:   传统列: {stats.get('Column', 0)}")
+        # 各查询相互独立，并发执行以重叠往返延迟
+        pool = self._get_query_pool()
+        stats_future = pool.submit(self.get_graph_statistics)
+        futures = {
+            cypher: pool.submit(self.executor.execute_transactional_read, cypher)
+            for cypher in (_CYPHER_DATABASES, _CYPHER_TOP_SHARED_GROUPS, _CYPHER_FIELD_GROUP_DISTRIBUTION, _CYPHER_UNIQUE_FIELD_TABLES)
+        }
+        stats = stats_future.result()
         
-        logger.info("GraphValidator: 关系统计:")
-        logger.info(f"GraphValidator:   数据库拥有模式关系: {stats.get('HAS_SCHEMA_Relationships', 0)}")
-        logger.info(f"GraphValidator:   模式拥有表关系: {stats.get('HAS_TABLE_Relationships', 0)}")
-        logger.info(f"GraphValidator:   表使用字段组关系: {stats.get('USES_FIELD_GROUP_Relationships', 0)}")
-        logger.info(f"GraphValidator:   字段组拥有字段关系: {stats.get('HAS_FIELD_Relationships', 0)}")
-        logger.info(f"GraphValidator:   表拥有独有字段关系: {stats.get('HAS_UNIQUE_FIELD_Relationships', 0)}")
-        logger.info(f"GraphValidator:   总关系数: {stats.get('Total_Relationships', 0)}")
+        # 不同类型的字段数已包含在统计结果中
+        shared_fields_count = stats.get('Shared_Fields', 0)
+        unique_fields_count = stats.get('Unique_Fields', 0)
         
-        # 显示一些示例查询结果
-        logger.info("GraphValidator: === 示例查询 ===")
+        lines = [
+            "=== 图数据库摘要 (共享字段组建模) ===",
+            "节点统计:",
+            f"  数据库: {stats.get('Database', 0)}",
+            f"  模式: {stats.get('Schema', 0)}",
+            f"  表: {stats.get('Table', 0)}",
+            f"  共享字段组: {stats.get('SharedFieldGroup', 0)}",
+            f"  共享字段: {shared_fields_count}",
+            f"  独有字段: {unique_fields_count}",
+            f"  字段总数: {stats.get('Field', 0)}",
+            f"  传统列: {stats.get('Column', 0)}",
+            "关系统计:",
+            f"  数据库拥有模式关系: {stats.get('HAS_SCHEMA_Relationships', 0)}",
+            f"  模式拥有表关系: {stats.get('HAS_TABLE_Relationships', 0)}",
+            f"  表使用字段组关系: {stats.get('USES_FIELD_GROUP_Relationships', 0)}",
+            f"  字段组拥有字段关系: {stats.get('HAS_FIELD_Relationships', 0)}",
+            f"  表拥有独有字段关系: {stats.get('HAS_UNIQUE_FIELD_Relationships', 0)}",
+            f"  总关系数: {stats.get('Total_Relationships', 0)}",
+            # 显示一些示例查询结果
+            "=== 示例查询 ===",
+        ]
         
-        # 查询所有数据库
-        db_cypher = "MATCH (d:Database) RETURN d.name AS database ORDER BY d.name"
-        success, result = self.executor.execute_transactional_cypher(db_cypher)
+        success, result = futures[_CYPHER_DATABASES].result()
         if success and result:
-            logger.info("GraphValidator: 数据库列表:")
-            for record in result:
-                logger.info(f"GraphValidator:   - {record['database']}")
+            lines.append("数据库列表:")
+            lines.extend(f"  - {record['database']}" for record in result)
         
-        # 查询共享字段组及其使用的表
-        shared_groups_cypher = """
-        MATCH (sfg:SharedFieldGroup)<-[:USES_FIELD_GROUP]-(t:Table)
-        RETURN sfg.name AS field_group, 
-               COUNT(t) AS table_count,
-               COLLECT(t.name)[..5] AS sample_tables
-        ORDER BY table_count DESC
-        LIMIT 5
-        """
-        success, result = self.executor.execute_transactional_cypher(shared_groups_cypher)
+        success, result = futures[_CYPHER_TOP_SHARED_GROUPS].result()
         if success and result:
-            logger.info("GraphValidator: 共享字段组及其使用表:")
+            lines.append("共享字段组及其使用表:")
             for record in result:
-                group = record['field_group']
-                count = record['table_count']
-                samples = record['sample_tables']
-                logger.info(f"GraphValidator:   {group}: {count} 个表使用")
-                for sample in samples:
-                    logger.info(f"GraphValidator:     - {sample}")
+                lines.append(f"  {record['field_group']}: {record['table_count']} 个表使用")
+                lines.extend(f"    - {sample}" for sample in record['sample_tables'])
         
-        # 查询字段组的字段分布
-        field_group_distribution_cypher = """
-        MATCH (sfg:SharedFieldGroup)-[:HAS_FIELD]->(f:Field)
-        RETURN sfg.name AS field_group, COUNT(f) AS field_count
-        ORDER BY field_count DESC
-        LIMIT 5
-        """
-        success, result = self.executor.execute_transactional_cypher(field_group_distribution_cypher)
+        success, result = futures[_CYPHER_FIELD_GROUP_DISTRIBUTION].result()
         if success and result:
-            logger.info("GraphValidator: 字段组字段分布:")
-            for record in result:
-                logger.info(f"GraphValidator:   {record['field_group']}: {record['field_count']} 个字段")
+            lines.append("字段组字段分布:")
+            lines.extend(f"  {record['field_group']}: {record['field_count']} 个字段" for record in result)
         
-        # 查询独有字段的表
-        unique_field_tables_cypher = """
-        MATCH (t:Table)-[:HAS_UNIQUE_FIELD]->(f:Field)
-        RETURN t.name AS table_name, COUNT(f) AS unique_field_count
-        ORDER BY unique_field_count DESC
-        LIMIT 5
-        """
-        success, result = self.executor.execute_transactional_cypher(unique_field_tables_cypher)
+        success, result = futures[_CYPHER_UNIQUE_FIELD_TABLES].result()
         if success and result:
-            logger.info("GraphValidator: 拥有独有字段的表:")
-            for record in result:
-                logger.info(f"GraphValidator:   {record['table_name']}: {record['unique_field_count']} 个独有字段")
+            lines.append("拥有独有字段的表:")
+            lines.extend(f"  {record['table_name']}: {record['unique_field_count']} 个独有字段" for record in result)
         
-        logger.info("GraphValidator: 建模摘要:")
+        lines.append("建模摘要:")
         table_count = stats.get('Table', 0)
         field_group_count = stats.get('SharedFieldGroup', 0)
         field_count = stats.get('Field', 0)
@@ -279,13 +383,15 @@ class GraphValidator:
             
             if uses_group_relationships > 0:
                 avg_tables_per_group = uses_group_relationships / field_group_count
-                logger.info(f"GraphValidator:   平均每个字段组被 {avg_tables_per_group:.1f} 个表使用")
+                lines.append(f"  平均每个字段组被 {avg_tables_per_group:.1f} 个表使用")
             
-            logger.info(f"GraphValidator:   字段组数量: {field_group_count}")
-            logger.info(f"GraphValidator:   使用共享字段组的表关系: {uses_group_relationships}")
-            logger.info(f"GraphValidator:   独有字段关系: {unique_field_relationships}")
+            lines.append(f"  字段组数量: {field_group_count}")
+            lines.append(f"  使用共享字段组的表关系: {uses_group_relationships}")
+            lines.append(f"  独有字段关系: {unique_field_relationships}")
             
             # 计算字段复用效果
             if field_count > 0:
                 shared_field_ratio = stats.get('HAS_FIELD_Relationships', 0) / field_count * 100
-                logger.info(f"GraphValidator:   字段共享率: {shared_field_ratio:.1f}%") 
\ No newline at end of file
+                lines.append(f"  字段共享率: {shared_field_ratio:.1f}%")
+        
+        logger.info("\n".join(lines)) 
\ No newline at end of file
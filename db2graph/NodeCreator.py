@@ -5,7 +5,7 @@
 import sys
 import os
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, List
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
@@ -138,6 +138,14 @@ class NodeCreator:
     
     def _escape_string(self, text: str) -> str:
         """正确的Cypher字符串转义方法，解决Neo4j查询中的特殊字符问题"""
+        cleaned_text = self._clean_string(text)
+        # 在Cypher字符串字面量中，单引号用反斜杠转义
+        cleaned_text = cleaned_text.replace('\\', '\\\\')  # 反斜杠转义（必须先转义反斜杠）
+        cleaned_text = cleaned_text.replace("'", "\\'")    # 单引号转义
+        return cleaned_text
+    
+    def _clean_string(self, text: str) -> str:
+        """清理文本中的控制字符、换行和多余空白并限制长度（不做引号转义，可直接作为查询参数）"""
         if not text:
             return ""
         
@@ -168,12 +176,9 @@ class NodeCreator:
         cleaned_text = cleaned_text.replace('\u2028', ' ') # 行分隔符
         cleaned_text = cleaned_text.replace('\u2029', ' ') # 段落分隔符
         
-        # 第四步：在Neo4j Cypher中正确转义字符和移除问题字符
+        # 第四步：移除问题字符
         # 关键修复：移除分号，避免CypherExecutor错误分割语句
         cleaned_text = cleaned_text.replace(';', ',')      # 分号替换为逗号
-        # 在Cypher字符串字面量中，单引号用反斜杠转义
-        cleaned_text = cleaned_text.replace('\\', '\\\\')  # 反斜杠转义（必须先转义反斜杠）
-        cleaned_text = cleaned_text.replace("'", "\\'")    # 单引号转义
         
         # 第五步：清理多余的空格
         cleaned_text = re.sub(r'\s+', ' ', cleaned_text).strip()
@@ -203,4 +208,34 @@ class NodeCreator:
             logger.debug(f"NodeCreator: 创建独有字段节点: {field_name} ({field_type}) -> {table_name}")
         else:
             logger.error(f"NodeCreator: 创建独有字段节点失败: {field_name}")
-        return success 
\ No newline at end of file
+        return success 
+    
+    def create_field_nodes(self, db_name: str, schema_name: str, table_name: str,
+                           fields: List[Dict[str, Any]]) -> bool:
+        """
+        批量创建同一张表的独有字段节点（UNWIND参数化写入，替代逐个字段调用 create_field_node）
+        Args:
+            fields: 字段列表，每项包含 name、type、description、sample_data
+        """
+        rows = [
+            {
+                "name": field["name"],
+                "type": field["type"],
+                "database": db_name,
+                "schema": schema_name,
+                "table": table_name,
+                "description": self._clean_string(field.get("description", "")),
+                "sample_data": self._clean_string(field.get("sample_data", "")),
+            }
+            for field in fields
+        ]
+        cypher = templates.create_node.format(
+            label="Field",
+            properties="name: row.name, type: row.type, database: row.database, schema: row.schema, table: row.table, description: row.description, sample_data: row.sample_data, node_type: 'unique_field'"
+        )
+        success = self.executor.execute_unwind_batch(cypher, rows)
+        if success:
+            logger.debug(f"NodeCreator: 批量创建独有字段节点: {len(rows)} 个 -> {table_name}")
+        else:
+            logger.error(f"NodeCreator: 批量创建独有字段节点失败: {table_name}")
+        return success
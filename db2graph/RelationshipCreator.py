@@ -5,6 +5,7 @@
 import sys
 import os
 import logging
+from typing import List
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
@@ -147,4 +148,22 @@ class RelationshipCreator:
             logger.debug(f"RelationshipCreator: 创建表-字段关系: {table_name} -> {field_name}")
         else:
             logger.error(f"RelationshipCreator: 创建表-字段关系失败: {table_name} -> {field_name}")
-        return success 
\ No newline at end of file
+        return success 
+    
+    def create_table_has_field_relationships(self, table_name: str, schema: str, field_names: List[str]) -> bool:
+        """批量创建表直接拥有字段的关系（UNWIND参数化写入，替代逐个字段调用 create_table_has_field_relationship）"""
+        rows = [{"table": table_name, "schema": schema, "name": field_name} for field_name in field_names]
+        cypher = templates.create_relationship.format(
+            label1="Table",
+            match1="name: row.table, schema: row.schema",
+            label2="Field",
+            match2="name: row.name, schema: row.schema, table: row.table, node_type: 'unique_field'",
+            rel_type="HAS_UNIQUE_FIELD",
+            rel_properties="type: 'has_unique_field'"
+        )
+        success = self.executor.execute_unwind_batch(cypher, rows)
+        if success:
+            logger.debug(f"RelationshipCreator: 批量创建表-字段关系: {table_name} ({len(rows)} 个字段)")
+        else:
+            logger.error(f"RelationshipCreator: 批量创建表-字段关系失败: {table_name}")
+        return success
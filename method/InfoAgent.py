@@ -3,9 +3,9 @@ InfoAgent - 纯函数式实现
 将InfoAgent的功能转换为简单的函数，避免类和复杂状态管理
 """
 
-import json
 import logging
 import sys
+import threading
 from pathlib import Path
 from typing import Dict, Any, List
 
@@ -31,6 +31,28 @@ if not _logger.handlers:
     handler.setFormatter(formatter)
     _logger.addHandler(handler)
 
+# 全局资源 - 延迟初始化，创建时加锁，避免并发调用时重复创建
+_cypher_executor = None
+_vector_manager = None
+_resource_lock = threading.Lock()
+
+def _get_cypher_executor():
+    """获取全局CypherExecutor实例，避免每次构建摘要时新建执行器和会话"""
+    global _cypher_executor
+    with _resource_lock:
+        if _cypher_executor is None:
+            _cypher_executor = CypherExecutor(enable_info_logging=True)
+        return _cypher_executor
+
+
+def _get_vector_manager():
+    """获取全局VectorizedFieldManager实例，使已加载的向量索引和向量缓存在多次搜索间复用"""
+    global _vector_manager
+    with _resource_lock:
+        if _vector_manager is None:
+            _vector_manager = VectorizedFieldManager(enable_info_logging=False)
+        return _vector_manager
+
 
 # ===== 核心函数式API =====
 
@@ -52,24 +74,22 @@ def search_related_fields(query: List[str], database_id: str, top_k: int = 3) ->
         return []
     
     try:
-        vector_manager = VectorizedFieldManager(enable_info_logging=False)
+        vector_manager = _get_vector_manager()
         all_results = []
         seen_field_ids = set()
         
-        # 对每个查询进行搜索
-        for query_text in query:
-            if not query_text.strip():
-                continue
-                
-            results = vector_manager.search_fields(query_text.strip(), database_id, top_k)
-            
+        # 所有查询一次向量化、一次检索
+        query_texts = [query_text.strip() for query_text in query if query_text.strip()]
+        batch_results = vector_manager.search_fields_batch(query_texts, database_id, top_k)
+        
+        for query_text, results in zip(query_texts, batch_results):
             # 添加未见过的结果
             for result in results:
                 field_id = result.get('field_id')
                 if field_id and field_id not in seen_field_ids:
                     seen_field_ids.add(field_id)
                     # 添加查询信息以便跟踪
-                    result['matched_query'] = query_text.strip()
+                    result['matched_query'] = query_text
                     all_results.append(result)
         
         # 按相似度分数排序（降序）
@@ -84,10 +104,6 @@ def search_related_fields(query: List[str], database_id: str, top_k: int = 3) ->
     except Exception as e:
         _logger.error(f"搜索相关字段时出错: {e}")
         return []
-    finally:
-        # 确保资源被正确释放
-        if 'vector_manager' in locals():
-            vector_manager.close()
 
 
 def get_intelligent_db_summary(database_id: str, user_query: str, top_k: int = 10) -> Dict[str, Any]:
@@ -169,7 +185,7 @@ def get_intelligent_db_summary(database_id: str, user_query: str, top_k: int = 1
         _logger.info(f"步骤4: 基于 {len(table_names)} 个相关表构建完整摘要树...")
         
         # 调试步骤：验证数据库和表的存在
-        cypher_executor = CypherExecutor(enable_info_logging=True)
+        cypher_executor = _get_cypher_executor()
         
         try:
             # 直接使用表名查询完整字段信息
@@ -4,9 +4,64 @@ import dotenv
 from neo4j import GraphDatabase
 from neo4j.exceptions import TransientError, ClientError, DatabaseError
 import logging
+import re
+import threading
+import atexit
+
+
+# Cypher 语句切分：跳过字符串、反引号标识符和注释中的分号，只在语句分隔处切分
+_STATEMENT_PATTERN = re.compile(
+    r"(?:'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|`[^`]*`|//[^\n]*|/\*.*?\*/|[^;])+",
+    re.S,
+)
+
+
+def _is_comment_only(statement):
+    """判断语句是否只由 // 注释行和空行组成"""
+    return all(
+        not line or line.startswith("//") for line in (l.strip() for l in statement.splitlines())
+    )
+
+
+def split_cypher_statements(cypher_statements_text):
+    """
+    将包含多个 Cypher 语句的文本按分号切分为语句列表。
+
+    Args:
+        cypher_statements_text (str): 包含一个或多个用分号分隔的Cypher语句的文本
+
+    Returns:
+        list: 去除首尾空白后的非空语句列表
+    """
+    text = cypher_statements_text.strip().rstrip(";").strip()
+    # 快速路径：单条语句无需经过切分
+    if ";" not in text:
+        return [text] if text else []
+    return [
+        stmt.strip() for stmt in _STATEMENT_PATTERN.findall(cypher_statements_text) if stmt.strip()
+    ]
+
+
+# 图查询依赖的索引：(索引名, 标签, 属性)。字段名在不同字段组/表之间会重复，因此只建普通索引而非唯一约束
+_GRAPH_INDEXES = (
+    ("field_schema_name", "Field", ("schema", "name")),
+    ("field_node_type", "Field", ("node_type",)),
+    ("field_database", "Field", ("database",)),
+    ("table_schema_name", "Table", ("schema", "name")),
+    ("shared_field_group_name", "SharedFieldGroup", ("name",)),
+)
 
 
 class CypherExecutor:
+    # 进程内所有实例共享同一个驱动（连接池），首次使用时创建；fork 后的子进程会重新创建
+    _shared_driver = None
+    _driver_pid = None
+    _driver_lock = threading.Lock()
+    _atexit_registered = False
+    # 写入代数：进程内任一实例成功提交写事务后递增，供统计缓存等判断数据是否变化
+    _write_generation = 0
+    _write_generation_lock = threading.Lock()
+
     def __init__(self, enable_info_logging=False):
         """
         初始化 CypherExecutor，建立与 Neo4j 数据库的连接。
@@ -24,16 +79,81 @@ class CypherExecutor:
         self.uri = "neo4j://10.21.37.13:7687"
         self.username = "neo4j"
         self.password = "neo4j1342"
+        self.database = "neo4j"  # 显式指定目标数据库，省去每次会话的路由表查询
 
-        try:
-            self._driver = GraphDatabase.driver(
-                self.uri, auth=(self.username, self.password)
-            )
-            # 移除立即验证，改为懒加载
-            self._log_info("Neo4j 驱动已初始化，等待首次使用时验证连接。")
-        except Exception as e:
-            logging.error(f"连接 Neo4j 数据库失败: {e}")
-            self._driver = None  # 确保如果连接失败，驱动对象为None
+        # 按线程缓存会话：会话本身非线程安全，但同一线程内可复用，避免每条语句重新获取连接
+        self._local = threading.local()
+        self._sessions = []
+        self._sessions_lock = threading.Lock()
+
+        # 索引是否已确认存在，ensure_indexes 只需执行一次
+        self._indexes_ensured = False
+
+        # 驱动改为首次使用时创建，并在所有实例间共享
+        self._log_info("Neo4j 驱动将在首次使用时初始化并验证连接。")
+
+    @classmethod
+    def _get_driver(cls, uri, auth):
+        """
+        获取进程内共享的驱动，不存在或进程已 fork 时创建。
+
+        Args:
+            uri (str): Neo4j 数据库的连接 URI
+            auth (tuple): (用户名, 密码)
+
+        Returns:
+            Driver: 共享的 Neo4j 驱动；创建失败时返回 None
+        """
+        pid = os.getpid()
+        driver = cls._shared_driver
+        if driver is not None and cls._driver_pid == pid:
+            return driver
+
+        with cls._driver_lock:
+            if cls._shared_driver is not None and cls._driver_pid == pid:
+                return cls._shared_driver
+            # fork 继承的连接属于父进程，不能在子进程中复用，直接丢弃引用
+            cls._shared_driver = None
+            try:
+                # 连接池与超时参数可通过环境变量调整
+                cls._shared_driver = GraphDatabase.driver(
+                    uri,
+                    auth=auth,
+                    max_connection_pool_size=int(os.getenv("NEO4J_POOL_SIZE", 32)),
+                    connection_acquisition_timeout=float(os.getenv("NEO4J_ACQUISITION_TIMEOUT", 30)),
+                    max_connection_lifetime=float(os.getenv("NEO4J_MAX_CONNECTION_LIFETIME", 3600)),
+                    connection_timeout=float(os.getenv("NEO4J_CONNECTION_TIMEOUT", 10)),
+                    keep_alive=True,
+                    fetch_size=int(os.getenv("NEO4J_FETCH_SIZE", 1000)),
+                )
+                cls._driver_pid = pid
+            except Exception as e:
+                logging.error(f"连接 Neo4j 数据库失败: {e}")
+                return None
+
+            if not cls._atexit_registered:
+                atexit.register(cls._close_driver)
+                cls._atexit_registered = True
+            return cls._shared_driver
+
+    @classmethod
+    def _close_driver(cls):
+        """
+        关闭进程内共享的驱动（解释器退出时自动调用）。
+        """
+        with cls._driver_lock:
+            driver, cls._shared_driver = cls._shared_driver, None
+            owned = cls._driver_pid == os.getpid()
+        if driver is not None and owned:
+            try:
+                driver.close()
+            except Exception as e:
+                logging.warning(f"关闭 Neo4j 驱动失败: {e}")
+
+    @property
+    def _driver(self):
+        """当前进程共享的 Neo4j 驱动"""
+        return self._get_driver(self.uri, (self.username, self.password))
 
     def _log_info(self, message):
         """
@@ -45,6 +165,39 @@ class CypherExecutor:
         if self.enable_info_logging:
             logging.info(message)
 
+    def _get_session(self):
+        """
+        获取当前线程缓存的会话，不存在时创建。
+
+        Returns:
+            Session: 当前线程复用的 Neo4j 会话
+        """
+        session = getattr(self._local, "session", None)
+        # fork 后子进程中继承的会话属于父进程的驱动，需要重新创建
+        if session is None or self._local.pid != os.getpid():
+            session = self._driver.session(database=self.database)
+            self._local.session = session
+            self._local.pid = os.getpid()
+            with self._sessions_lock:
+                self._sessions.append(session)
+        return session
+
+    def _discard_session(self):
+        """
+        关闭并丢弃当前线程缓存的会话，下次执行时重新创建。
+        """
+        session = getattr(self._local, "session", None)
+        if session is None:
+            return
+        self._local.session = None
+        with self._sessions_lock:
+            if session in self._sessions:
+                self._sessions.remove(session)
+        try:
+            session.close()
+        except Exception as e:
+            logging.warning(f"关闭 Neo4j 会话失败: {e}")
+
     def verify_connectivity(self):
         """
         验证与 Neo4j 数据库的连接。
@@ -65,7 +218,7 @@ class CypherExecutor:
             return False
 
     def _execute_multiple_cypher_in_transaction(
-        self, tx, cypher_statements_text, parameters=None
+        self, tx, cypher_statements_text, parameters=None, consume_as="data"
     ):
         """
         在单个事务中执行多个 Cypher 语句。这是供内部调用的辅助方法。
@@ -74,9 +227,11 @@ class CypherExecutor:
             tx: Neo4j 事务对象。
             cypher_statements_text (str): 包含多个用分号分隔的Cypher语句的文本
             parameters (dict, optional): Cypher 语句的参数。默认为 None。
+            consume_as (str, optional): 结果读取方式，见 execute_transactional_cypher。默认为 "data"。
 
         Returns:
-            list: 所有Cypher查询的结果数据列表。
+            list: 所有Cypher查询的结果数据列表（"data"/"none" 模式）；
+            "single"/"scalar" 模式下返回最后一个语句的首条记录或其第一列的值。
 
         Raises:
             Exception: 当连续3个语句执行失败时抛出异常
@@ -85,9 +240,7 @@ class CypherExecutor:
             parameters = {}
 
         # 分割语句
-        statements = [
-            stmt.strip() for stmt in cypher_statements_text.split(";") if stmt.strip()
-        ]
+        statements = split_cypher_statements(cypher_statements_text)
 
         if not statements:
             logging.warning("没有找到有效的Cypher语句")
@@ -96,13 +249,14 @@ class CypherExecutor:
         self._log_info(f"在事务中准备执行 {len(statements)} 个Cypher语句")
 
         all_results = []
+        last_value = None
         success_count = 0
         consecutive_failures = 0  # 连续失败计数器
         max_consecutive_failures = 3  # 最大连续失败次数
 
         for i, statement in enumerate(statements, 1):
-            # 跳过注释行
-            if statement.strip().startswith("//"):
+            # 跳过只包含注释的语句
+            if _is_comment_only(statement):
                 self._log_info(f"跳过注释语句 {i}: {statement[:50]}...")
                 continue
 
@@ -111,8 +265,19 @@ class CypherExecutor:
             try:
                 result = tx.run(statement, parameters)
                 # 在事务内部立即处理结果，避免事务关闭后访问
-                result_data = result.data()
-                all_results.extend(result_data)
+                if consume_as == "data":
+                    all_results.extend(result.data())
+                elif consume_as == "none":
+                    # 只需要执行效果，不物化任何记录
+                    result.consume()
+                else:
+                    record = result.single()
+                    if record is None:
+                        last_value = None
+                    elif consume_as == "scalar":
+                        last_value = record[0]
+                    else:
+                        last_value = record.data()
                 success_count += 1
                 consecutive_failures = 0  # 重置连续失败计数器
                 self._log_info(f"语句 {i} 执行成功")
@@ -134,12 +299,14 @@ class CypherExecutor:
                 # 如果没有达到上限，继续执行下一个语句
                 continue
 
-        total_executed = len([s for s in statements if not s.strip().startswith("//")])
+        total_executed = len([s for s in statements if not _is_comment_only(s)])
         self._log_info(f"事务中执行完成: {success_count}/{total_executed} 个语句成功")
 
+        if consume_as in ("single", "scalar"):
+            return last_value
         return all_results
 
-    def execute_transactional_cypher(self, cypher_statement, parameters=None):
+    def execute_transactional_cypher(self, cypher_statement, parameters=None, consume_as="data"):
         """
         将输入的 Cypher 语句包装成一个事务并执行。
         支持单个语句或多个用分号分隔的语句。
@@ -148,46 +315,167 @@ class CypherExecutor:
         Args:
             cypher_statement (str): 要执行的 Cypher 语句，可以是单个语句或多个用分号分隔的语句
             parameters (dict, optional): Cypher 语句中使用的参数。默认为 None。
+            consume_as (str, optional): 结果读取方式。默认为 "data"。
+                "data": 返回所有记录的字典列表；
+                "single": 只返回最后一个语句首条记录的字典；
+                "scalar": 只返回最后一个语句首条记录第一列的值，适用于 COUNT 类查询；
+                "none": 不读取记录，返回空列表，适用于只关心执行效果的写入语句。
 
         Returns:
             bool: 如果事务成功提交则为 True，否则为 False。
-            list: 如果成功，返回查询结果的记录列表；如果失败，返回空列表。
+            list: 如果成功，按 consume_as 返回查询结果；如果失败，返回空列表。
+
+        Raises:
+            Exception: 当连续3个语句执行失败时抛出异常
+        """
+        return self._execute_in_session("write", cypher_statement, parameters, consume_as)
+
+    def execute_transactional_read(self, cypher_statement, parameters=None, consume_as="data"):
+        """
+        将输入的 Cypher 语句包装成一个只读事务并执行。
+        适用于纯 MATCH/COUNT 查询，在集群部署下可由从节点处理，不占用写入路径。
+
+        Args:
+            cypher_statement (str): 要执行的 Cypher 语句，可以是单个语句或多个用分号分隔的语句
+            parameters (dict, optional): Cypher 语句中使用的参数。默认为 None。
+            consume_as (str, optional): 结果读取方式，见 execute_transactional_cypher。默认为 "data"。
+
+        Returns:
+            bool: 如果事务成功执行则为 True，否则为 False。
+            list: 如果成功，按 consume_as 返回查询结果；如果失败，返回空列表。
 
         Raises:
             Exception: 当连续3个语句执行失败时抛出异常
         """
+        return self._execute_in_session("read", cypher_statement, parameters, consume_as)
+
+    def execute_unwind_batch(self, cypher_template, rows, batch_size=1000):
+        """
+        用 UNWIND 批量执行同一模板的写入语句：每批参数行只需一次往返和一次查询规划，
+        替代逐条拼接字面量语句后再按分号执行。
+
+        Args:
+            cypher_template (str): 以 row 引用当前参数行的语句，例如 "CREATE (:Person {name: row.name})"
+            rows (list): 参数行（字典）列表
+            batch_size (int, optional): 每个事务处理的行数。默认为 1000。
+
+        Returns:
+            bool: 所有批次均成功提交时为 True，否则为 False。
+        """
+        cypher = f"UNWIND $rows AS row\n{cypher_template}"
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            success, _ = self.execute_transactional_cypher(cypher, {"rows": batch}, consume_as="none")
+            if not success:
+                logging.error(f"批量写入失败: 第 {start + 1}-{start + len(batch)} 行")
+                return False
+        return True
+
+    def _execute_in_session(self, access_mode, cypher_statement, parameters=None, consume_as="data"):
+        """
+        在会话中以读或写事务执行 Cypher 语句。这是供内部调用的辅助方法。
+
+        Args:
+            access_mode (str): "read" 或 "write"
+            cypher_statement (str): 要执行的 Cypher 语句
+            parameters (dict, optional): Cypher 语句中使用的参数。默认为 None。
+            consume_as (str, optional): 结果读取方式。默认为 "data"。
+
+        Returns:
+            tuple: (是否成功, 查询结果)
+        """
         if not self._driver:
             logging.error("数据库连接未建立，无法执行 Cypher 语句。")
             return False, []
 
-        with self._driver.session() as session:
-            try:
-                # 多个语句，在一个事务中执行
-                result = session.execute_write(
-                    self._execute_multiple_cypher_in_transaction,
-                    cypher_statement,
-                    parameters
-                )
-                self._log_info("事务成功提交。")
-                return True, result
+        session = self._get_session()
+        execute = session.execute_read if access_mode == "read" else session.execute_write
+        try:
+            # 多个语句，在一个事务中执行
+            result = execute(
+                self._execute_multiple_cypher_in_transaction,
+                cypher_statement,
+                parameters,
+                consume_as
+            )
+            self._log_info("事务成功提交。")
+            if access_mode == "write":
+                self.invalidate_stats()
+            return True, result
+
+        except (TransientError, ClientError, DatabaseError) as e:
+            logging.error(f"Cypher 语句执行失败，事务已回滚。Neo4j 错误: {e}")
+            # 出错后的会话状态不确定，丢弃后下次重新创建
+            self._discard_session()
+            return False, []
+        except Exception as e:
+            logging.error(f"Cypher 语句执行失败，事务已回滚。错误: {e}")
+            self._discard_session()
+            # 重新抛出连续失败异常
+            if "连续" in str(e) and "执行失败" in str(e):
+                raise
+            return False, []
 
-            except (TransientError, ClientError, DatabaseError) as e:
-                logging.error(f"Cypher 语句执行失败，事务已回滚。Neo4j 错误: {e}")
-                return False, []
-            except Exception as e:
-                logging.error(f"Cypher 语句执行失败，事务已回滚。错误: {e}")
-                # 重新抛出连续失败异常
-                if "连续" in str(e) and "执行失败" in str(e):
-                    raise
-                return False, []
+    def ensure_indexes(self):
+        """
+        创建图查询依赖的索引（幂等，每个执行器只执行一次），并通过 SHOW INDEXES 确认索引状态。
+
+        Returns:
+            bool: 所有索引均已存在且在线时返回 True，否则返回 False
+        """
+        if self._indexes_ensured:
+            return True
+
+        create_statements = ";\n".join(
+            f"CREATE INDEX {name} IF NOT EXISTS FOR (n:{label}) ON ({', '.join(f'n.{prop}' for prop in props)})"
+            for name, label, props in _GRAPH_INDEXES
+        )
+        success, _ = self.execute_transactional_cypher(create_statements, consume_as="none")
+        if not success:
+            logging.warning("创建图索引失败，查询将退化为标签扫描")
+            return False
+
+        success, result = self.execute_transactional_read(
+            "SHOW INDEXES YIELD name, state WHERE name IN $names RETURN name, state",
+            {"names": [name for name, _, _ in _GRAPH_INDEXES]},
+        )
+        states = {record["name"]: record["state"] for record in result} if success else {}
+        not_online = [name for name, _, _ in _GRAPH_INDEXES if states.get(name) != "ONLINE"]
+        if not_online:
+            # 索引刚创建时可能仍在填充，下次调用时重新检查
+            logging.warning(f"以下图索引尚未就绪: {not_online}")
+            return False
+
+        self._indexes_ensured = True
+        self._log_info("图索引已就绪。")
+        return True
+
+    @property
+    def write_generation(self):
+        """进程内共享的写入代数，任一 CypherExecutor 实例提交写事务后都会变化"""
+        return CypherExecutor._write_generation
+
+    def invalidate_stats(self):
+        """
+        使依赖图数据的统计缓存失效（写事务提交后自动调用，外部写入后也可手动调用）。
+        写入代数在所有实例间共享，其他执行器的写入同样会使缓存失效。
+        """
+        with CypherExecutor._write_generation_lock:
+            CypherExecutor._write_generation += 1
 
     def close(self):
         """
-        关闭数据库连接。
+        关闭本实例缓存的会话。共享驱动由其他实例继续使用，在解释器退出时统一关闭。
         """
-        if self._driver:
-            self._driver.close()
-            self._log_info("Neo4j 数据库连接已关闭。")
+        with self._sessions_lock:
+            sessions, self._sessions = self._sessions, []
+        for session in sessions:
+            try:
+                session.close()
+            except Exception as e:
+                logging.warning(f"关闭 Neo4j 会话失败: {e}")
+        self._local = threading.local()
+        self._log_info("Neo4j 会话已关闭。")
 
 
 if __name__ == "__main__":
@@ -196,11 +484,11 @@ if __name__ == "__main__":
     """
     executor = CypherExecutor()
     print(executor.verify_connectivity())
-    str = """
-CREATE (:Person {name: 'Alice', age: 30});
-CREATE (:Person {name: 'Bob', age: 25});
-CREATE (:Person {name: 'Charlie', age: 35});
-CREATE (:City {name: 'London'});
-"""
-    executor.execute_transactional_cypher(str)
+    people = [
+        {"name": "Alice", "age": 30},
+        {"name": "Bob", "age": 25},
+        {"name": "Charlie", "age": 35},
+    ]
+    executor.execute_unwind_batch("CREATE (:Person {name: row.name, age: row.age})", people)
+    executor.execute_transactional_cypher("CREATE (:City {name: 'London'})")
     executor.close()
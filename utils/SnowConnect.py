@@ -5,60 +5,183 @@ Snowflake数据库连接模块
 """
 
 import snowflake.connector
+from snowflake.connector.errors import InterfaceError, OperationalError
 import os
-from typing import Optional, Dict, Any, List
+import re
+import time
+import random
+import pickle
+import hashlib
+import threading
+import atexit
+from functools import lru_cache
+from pathlib import Path
+from collections import defaultdict, deque
+from typing import Optional, Dict, Any, List, Tuple, Callable
 import logging
 from dotenv import load_dotenv
 
 # 导入连接池模块
 try:
     from utils.SnowflakeConnectionPool import snowflake_sql_query_with_pool, get_pool_stats, close_global_pool
+    from utils.SnowflakeConnectionPool import SnowflakePoolExhaustedError, SnowflakeRetryExhaustedError
     _HAS_POOL = True
 except ImportError:
     _HAS_POOL = False
 
 
-def snowflake_sql_query(
-    sql_query: str, database_id: str, timeout: int = 30, log: bool = False, use_pool: bool = True
-) -> List[Dict[str, Any]]:
-    """
-    执行Snowflake SQL查询并返回结果
+# 连接池暂时已满时，在池内退避重试的次数
+_POOL_BUSY_RETRIES = 3
+# 连接池无法完成查询、需要回退到原始连接时的返回标记
+_POOL_UNAVAILABLE = object()
+
+# 逐批读取结果的行数
+_FETCH_BATCH_SIZE = 10_000
+
+# 查询结果缓存目录（仅在调用时指定 cache_ttl 才启用），默认位于项目根目录下，不随工作目录变化；
+# 可通过环境变量 SNOWFLAKE_QUERY_CACHE_DIR 指定。缓存文件用 pickle 读写，加载时可执行任意代码，
+# 只能用于本机可信目录，不得指向其他用户可写或共享的位置
+_QUERY_CACHE_DIR = Path(
+    os.getenv("SNOWFLAKE_QUERY_CACHE_DIR")
+    or Path(__file__).resolve().parent.parent / "resource" / "snowflake_cache"
+)
+# 结果随时间或会话变化的查询不缓存
+_NON_DETERMINISTIC_SQL = re.compile(
+    r"\b(CURRENT_(TIMESTAMP|TIME|DATE|USER|ROLE|VERSION|SESSION)|SYSDATE|GETDATE|RANDOM|UUID_STRING|SEQ\d)\b",
+    re.IGNORECASE,
+)
+
+
+def _query_cache_path(sql_query: str, database_id: str) -> Optional[Path]:
+    """计算查询结果缓存文件路径，不可缓存的查询返回None"""
+    if _NON_DETERMINISTIC_SQL.search(sql_query):
+        return None
+    # 只归一化空白；不转换大小写，避免字符串字面量不同的查询共用缓存
+    normalized_sql = " ".join(sql_query.split())
+    digest = hashlib.sha256(f"{database_id}\x1f{normalized_sql}".encode("utf-8")).hexdigest()
+    return _QUERY_CACHE_DIR / f"{digest}.pkl"
+
+
+def _read_query_cache(cache_path: Path, cache_ttl: int) -> Optional[List[Dict[str, Any]]]:
+    """读取未过期的缓存结果，不存在、过期或损坏时返回None"""
+    try:
+        if time.time() - cache_path.stat().st_mtime >= cache_ttl:
+            return None
+        with open(cache_path, "rb") as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
 
-    参数:
-        sql_query (str): 要执行的SQL查询语句
-        database_id (str): 数据库标识符
-        timeout (int): 连接超时时间，默认30秒
-        log (bool): 是否输出SQL查询语句日志，默认为False
-        use_pool (bool): 是否使用连接池，默认为True
 
-    返回:
-        List[Dict[str, Any]]: 查询结果，每行数据作为字典返回
+def _write_query_cache(cache_path: Path, results: List[Dict[str, Any]]) -> None:
+    """写入缓存结果（先写临时文件再替换，避免并发读到半个文件）"""
+    try:
+        # 新建的缓存目录只允许当前用户访问
+        cache_path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        tmp_path = cache_path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump(results, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except (OSError, pickle.PicklingError) as e:
+        logging.warning(f"写入查询结果缓存失败: {e}")
+
+
+# 直连参数中与数据库和超时无关的固定部分，每次查询只补充可变项
+_CONNECTION_TEMPLATE = {
+    "application": "Schema_Extractor",  # 标识应用
+    "client_prefetch_threads": 4,  # 大结果集并行下载结果分块
+}
+
+# 回退路径的连接复用：按(数据库, 超时)缓存少量空闲连接，避免每次查询都重新握手登录；
+# 空闲超过 _FALLBACK_MAX_IDLE_SECONDS 的连接可能已被服务端断开或会话过期，不再复用
+_FALLBACK_IDLE_PER_KEY = 4
+_FALLBACK_MAX_IDLE_SECONDS = 300
+_fallback_idle: Dict[Tuple[str, int], deque] = defaultdict(deque)  # 元素为(连接, 归还时间)
+_fallback_lock = threading.Lock()
+
+# 会话失效类错误码：会话不存在、会话令牌过期、主令牌过期
+_SESSION_EXPIRED_ERRNOS = frozenset({390111, 390112, 390114})
+
+
+def _is_stale_connection_error(error: Exception) -> bool:
+    """判断错误是否由连接断开或会话过期引起（换一个新连接重试可能成功）"""
+    return (
+        isinstance(error, (OperationalError, InterfaceError))
+        or getattr(error, "errno", None) in _SESSION_EXPIRED_ERRNOS
+    )
+
+
+def _close_quietly(conn) -> None:
+    """关闭连接，忽略已断开连接关闭时的错误"""
+    try:
+        conn.close()
+    except Exception as e:
+        logging.debug(f"关闭Snowflake连接失败: {e}")
 
-    异常:
-        ValueError: SQL查询为空时抛出
-        ConnectionError: 连接失败时抛出
-        Exception: 执行查询时发生错误
+
+def _acquire_fallback_connection(key: Tuple[str, int], connection_params: Dict[str, Any]):
     """
-    if not sql_query or not sql_query.strip():
-        raise ValueError("SQL查询不能为空")
+    取出一个仍然打开且未空闲过久的连接，没有时新建连接
 
-    if not database_id or not database_id.strip():
-        raise ValueError("数据库ID不能为空")
-    
-    # 如果可以使用连接池且启用了连接池，则使用连接池
-    if _HAS_POOL and use_pool:
-        try:
-            return snowflake_sql_query_with_pool(
-                sql_query=sql_query,
-                database_id=database_id,
-                timeout=timeout,
-                log=log
-            )
-        except Exception as e:
-            # 如果连接池失败，回退到原始连接方式
-            logging.warning(f"连接池查询失败，回退到原始连接: {e}")
-            pass  # 继续执行原始连接逻辑
+    返回:
+        Tuple[connection, bool]: (连接, 是否为复用的空闲连接)
+    """
+    now = time.monotonic()
+    stale = []
+    conn = None
+    with _fallback_lock:
+        idle = _fallback_idle[key]
+        while idle:
+            candidate, released_at = idle.pop()
+            if candidate.is_closed():
+                continue
+            if now - released_at > _FALLBACK_MAX_IDLE_SECONDS:
+                # 后进先出，剩下的连接空闲更久，一并丢弃
+                stale.append(candidate)
+                stale.extend(c for c, _ in idle)
+                idle.clear()
+                break
+            conn = candidate
+            break
+    for stale_conn in stale:
+        _close_quietly(stale_conn)
+    if conn is not None:
+        return conn, True
+    return snowflake.connector.connect(**connection_params), False
+
+
+def _release_fallback_connection(key: Tuple[str, int], conn) -> None:
+    """归还连接供后续查询复用，超出缓存上限时直接关闭"""
+    if conn.is_closed():
+        return
+    with _fallback_lock:
+        idle = _fallback_idle[key]
+        if len(idle) < _FALLBACK_IDLE_PER_KEY:
+            idle.append((conn, time.monotonic()))
+            return
+    conn.close()
+
+
+def _close_fallback_connections() -> None:
+    """关闭所有缓存的空闲连接（解释器退出时自动调用）"""
+    with _fallback_lock:
+        conns = [conn for idle in _fallback_idle.values() for conn, _ in idle]
+        _fallback_idle.clear()
+    for conn in conns:
+        _close_quietly(conn)
+
+
+atexit.register(_close_fallback_connections)
+
+
+@lru_cache(maxsize=1)
+def _snowflake_credentials() -> Tuple[str, str, str]:
+    """
+    读取Snowflake连接凭据，.env 只在进程内首次调用时加载一次
 
+    异常:
+        ConnectionError: 缺少必需的环境变量时抛出（异常不会被缓存，下次调用重新读取）
+    """
     # 加载环境变量
     load_dotenv(".env")
 
@@ -75,8 +198,21 @@ def snowflake_sql_query(
     if not account:
         raise ConnectionError("未找到SNOWFLAKE_ACCOUNT环境变量")
 
-    # 连接参数（优化超时设置）
-    connection_params = {
+    return user, password, account
+
+
+def _build_connection_params(database_id: str, timeout: int) -> Dict[str, Any]:
+    """
+    根据环境变量构建直连Snowflake的连接参数
+
+    异常:
+        ConnectionError: 缺少必需的环境变量时抛出
+    """
+    user, password, account = _snowflake_credentials()
+
+    # 连接参数（优化超时设置），固定部分来自模块级模板
+    return {
+        **_CONNECTION_TEMPLATE,
         "user": user,
         "password": password,
         "account": account,
@@ -84,44 +220,97 @@ def snowflake_sql_query(
         "login_timeout": min(timeout, 60),  # 登录超时最大60秒
         "network_timeout": timeout,
         "socket_timeout": timeout,
-        "application": "Schema_Extractor",  # 标识应用
         "session_parameters": {
             "QUERY_TIMEOUT": timeout,  # 查询级别超时
             "STATEMENT_TIMEOUT_IN_SECONDS": timeout,
         },
     }
 
+
+def _fetch_dict_rows(cursor) -> List[Dict[str, Any]]:
+    """分批读取结果并直接转换为字典列表，不再先用 fetchall 物化全部原始行"""
+    columns = tuple(desc[0] for desc in cursor.description) if cursor.description else ()
+    if not columns:
+        return []
+    return [
+        dict(zip(columns, row))
+        for rows in iter(lambda: cursor.fetchmany(_FETCH_BATCH_SIZE), [])
+        for row in rows
+    ]
+
+
+def _fetch_arrow_table(cursor):
+    """以Arrow列式表读取结果，空结果时 fetch_arrow_all 返回 None，补一个只有列名的空表"""
+    import pyarrow as pa
+
+    table = cursor.fetch_arrow_all()
+    if table is None:
+        table = pa.table({desc[0]: [] for desc in cursor.description or ()})
+    return table
+
+
+def _execute_and_fetch(conn, sql_query: str, fetch: Callable[[Any], Any]):
+    """在连接上创建游标执行查询，由 fetch 读取结果后关闭游标"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql_query)
+        return fetch(cursor)
+    finally:
+        cursor.close()
+
+
+def _run_fallback_query(
+    sql_query: str,
+    database_id: str,
+    timeout: int,
+    log: bool,
+    fetch: Callable[[Any], Any],
+):
+    """
+    不经连接池直接执行查询（复用同一数据库的空闲连接），由 fetch 从游标读取结果
+
+    参数:
+        sql_query (str): 要执行的SQL查询语句
+        database_id (str): 数据库标识符
+        timeout (int): 连接超时时间（秒）
+        log (bool): 是否输出SQL查询语句日志
+        fetch (Callable): 接收执行后的游标并返回查询结果
+
+    返回:
+        fetch 的返回值
+
+    异常:
+        ConnectionError: 连接失败时抛出
+        Exception: 执行查询时发生错误
+    """
+    connection_params = _build_connection_params(database_id, timeout)
+
     conn = None
-    cursor = None
+    conn_key = (database_id, timeout)
+    reusable = False
 
     try:
         if log:
             logging.info(f"正在连接到Snowflake数据库: {database_id}")
             logging.info(f"执行SQL查询: {sql_query}")
 
-        # 建立连接
-        conn = snowflake.connector.connect(**connection_params)
-
-        # 创建游标并执行查询
-        cursor = conn.cursor()
-        cursor.execute(sql_query)
-
-        # 获取列名
-        columns = [desc[0] for desc in cursor.description] if cursor.description else []
-
-        # 获取所有结果
-        rows = cursor.fetchall()
+        # 建立连接（优先复用同一数据库的空闲连接）
+        conn, reused = _acquire_fallback_connection(conn_key, connection_params)
 
-        # 将结果转换为字典列表
-        results = []
-        for row in rows:
-            row_dict = {}
-            for i, value in enumerate(row):
-                column_name = columns[i] if i < len(columns) else f"column_{i}"
-                row_dict[column_name] = value
-            results.append(row_dict)
+        try:
+            results = _execute_and_fetch(conn, sql_query, fetch)
+        except snowflake.connector.Error as e:
+            # 复用的空闲连接可能已断开或会话已过期，换一个新连接重试一次
+            if not (reused and _is_stale_connection_error(e)):
+                raise
+            logging.warning(f"复用的Snowflake连接已失效，使用新连接重试: {e}")
+            _close_quietly(conn)
+            conn = None
+            conn = snowflake.connector.connect(**connection_params)
+            results = _execute_and_fetch(conn, sql_query, fetch)
 
         logging.info(f"查询完成，返回{len(results)}行数据")
+        reusable = True
         return results
 
     except snowflake.connector.Error as e:
@@ -134,10 +323,137 @@ def snowflake_sql_query(
 
     finally:
         # 清理资源
-        if cursor:
-            cursor.close()
         if conn:
-            conn.close()
+            # 只有查询成功的连接才放回复用，出错的连接状态不确定，直接关闭
+            if reusable:
+                _release_fallback_connection(conn_key, conn)
+            else:
+                _close_quietly(conn)
+
+
+def _run_pool_query(sql_query: str, database_id: str, timeout: int, log: bool, result_format: str = "dict"):
+    """
+    通过连接池执行查询，连接池不可用时返回 _POOL_UNAVAILABLE，由调用方回退到原始连接
+
+    SQL本身的错误直接抛出，不再用新连接重复执行；只有连接层面的失败才回退到原始连接
+    """
+    for attempt in range(_POOL_BUSY_RETRIES):
+        try:
+            return snowflake_sql_query_with_pool(
+                sql_query=sql_query,
+                database_id=database_id,
+                timeout=timeout,
+                log=log,
+                result_format=result_format
+            )
+        except SnowflakePoolExhaustedError as e:
+            # 连接池暂时已满，短暂退避后在池内重试，不急于新建冷连接
+            if attempt == _POOL_BUSY_RETRIES - 1:
+                logging.warning(f"连接池持续繁忙，回退到原始连接: {e}")
+                break
+            time.sleep(0.05 * (2 ** attempt) + random.uniform(0, 0.02))
+        except (SnowflakeRetryExhaustedError, RuntimeError) as e:
+            # 连接问题重试耗尽或连接池已关闭，回退到原始连接方式
+            logging.warning(f"连接池查询失败，回退到原始连接: {e}")
+            break
+    return _POOL_UNAVAILABLE
+
+
+def snowflake_sql_query(
+    sql_query: str,
+    database_id: str,
+    timeout: int = 30,
+    log: bool = False,
+    use_pool: bool = True,
+    cache_ttl: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    执行Snowflake SQL查询并返回结果
+
+    参数:
+        sql_query (str): 要执行的SQL查询语句
+        database_id (str): 数据库标识符
+        timeout (int): 连接超时时间，默认30秒
+        log (bool): 是否输出SQL查询语句日志，默认为False
+        use_pool (bool): 是否使用连接池，默认为True
+        cache_ttl (Optional[int]): 结果缓存有效期（秒），默认为None即不缓存；
+            启用后相同数据库和SQL（忽略空白差异）的重复查询直接读取本地缓存；
+            缓存为 pickle 文件，只应在缓存目录可信时启用（见 _QUERY_CACHE_DIR）
+
+    返回:
+        List[Dict[str, Any]]: 查询结果，每行数据作为字典返回
+
+    异常:
+        ValueError: SQL查询为空时抛出
+        ConnectionError: 连接失败时抛出
+        Exception: 执行查询时发生错误
+    """
+    if not sql_query or not sql_query.strip():
+        raise ValueError("SQL查询不能为空")
+
+    if not database_id or not database_id.strip():
+        raise ValueError("数据库ID不能为空")
+
+    if cache_ttl:
+        cache_path = _query_cache_path(sql_query, database_id)
+        if cache_path is not None:
+            results = _read_query_cache(cache_path, cache_ttl)
+            if results is None:
+                results = snowflake_sql_query(sql_query, database_id, timeout, log, use_pool)
+                _write_query_cache(cache_path, results)
+            elif log:
+                logging.info(f"命中查询结果缓存: {cache_path.name}")
+            return results
+    
+    # 如果可以使用连接池且启用了连接池，则使用连接池
+    if _HAS_POOL and use_pool:
+        results = _run_pool_query(sql_query, database_id, timeout, log)
+        if results is not _POOL_UNAVAILABLE:
+            return results
+
+    return _run_fallback_query(sql_query, database_id, timeout, log, _fetch_dict_rows)
+
+
+def snowflake_sql_query_arrow(
+    sql_query: str,
+    database_id: str,
+    timeout: int = 30,
+    log: bool = False,
+    use_pool: bool = True,
+):
+    """
+    执行Snowflake SQL查询并以Arrow列式表返回结果，适用于大结果集
+
+    结果分块以Arrow格式直接下载，不逐行构造Python字典；
+    需要字典列表时可调用 table.to_pylist()。
+
+    参数:
+        sql_query (str): 要执行的SQL查询语句
+        database_id (str): 数据库标识符
+        timeout (int): 连接超时时间，默认30秒
+        log (bool): 是否输出SQL查询语句日志，默认为False
+        use_pool (bool): 是否使用连接池，默认为True
+
+    返回:
+        pyarrow.Table: 查询结果
+
+    异常:
+        ValueError: SQL查询为空时抛出
+        ConnectionError: 连接失败时抛出
+        Exception: 执行查询时发生错误
+    """
+    if not sql_query or not sql_query.strip():
+        raise ValueError("SQL查询不能为空")
+
+    if not database_id or not database_id.strip():
+        raise ValueError("数据库ID不能为空")
+
+    if _HAS_POOL and use_pool:
+        table = _run_pool_query(sql_query, database_id, timeout, log, result_format="arrow")
+        if table is not _POOL_UNAVAILABLE:
+            return table
+
+    return _run_fallback_query(sql_query, database_id, timeout, log, _fetch_arrow_table)
 
 
 if __name__ == "__main__":
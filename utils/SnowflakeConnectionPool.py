@@ -4,17 +4,70 @@ Snowflake连接池管理模块
 """
 
 import snowflake.connector
+from snowflake.connector.errors import InterfaceError, OperationalError
 import os
 import time
 import logging
 import threading
-from typing import Optional, Dict, Any, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, Set
 from dotenv import load_dotenv
-from queue import Queue, Empty
+from collections import deque
 from contextlib import contextmanager
 from dataclasses import dataclass
+from functools import lru_cache
 from enum import Enum
 import random
+import re
+from array import array
+
+# 连接相关的错误信息关键词，可以重试
+_RETRYABLE_KEYWORDS = [
+    'timeout', 'timed out', 'read timeout', 'connection timeout',
+    'connection reset', 'connection refused', 'connection failed',
+    'network', 'unreachable', 'connection error', 'socket timeout',
+    'broken pipe', 'connection aborted', 'connection lost',
+    'temporary failure', 'service unavailable', 'server error',
+    'internal server error', '500', '502', '503', '504',
+    'retry', 'throttled', 'rate limit', 'too many requests'
+]
+
+# 连接相关的异常类型名关键词
+_RETRYABLE_TYPES = [
+    'timeout', 'connectionerror', 'networkerror', 'readtimeout',
+    'connectiontimeout', 'sockettimeout', 'httperror'
+]
+
+# 模块加载时编译为单个正则，一次扫描代替逐个关键词的子串查找
+_RETRYABLE_MSG_RE = re.compile("|".join(map(re.escape, _RETRYABLE_KEYWORDS)), re.IGNORECASE)
+_RETRYABLE_TYPE_RE = re.compile("|".join(map(re.escape, _RETRYABLE_TYPES)), re.IGNORECASE)
+
+# 结果集分批读取的行数
+_FETCH_BATCH_SIZE = 10_000
+
+# 健康检查并发探测连接的线程数
+_HEALTH_CHECK_WORKERS = 8
+
+# 预热连接时并发建立连接的线程数
+_CONNECT_WORKERS = 4
+
+# 统计计数器的槽位
+_STAT_NAMES = (
+    'total_created',
+    'total_destroyed',
+    'total_borrowed',
+    'total_returned',
+    'total_health_checks',
+    'total_retries',
+)
+(_C_CREATED, _C_DESTROYED, _C_BORROWED,
+ _C_RETURNED, _C_HEALTH_CHECKS, _C_RETRIES) = range(len(_STAT_NAMES))
+
+
+@lru_cache(maxsize=1)
+def _load_env():
+    """加载 .env 环境变量（进程内只解析一次文件）"""
+    load_dotenv(".env")
 
 
 class ConnectionStatus(Enum):
@@ -24,14 +77,24 @@ class ConnectionStatus(Enum):
     UNKNOWN = "unknown"
 
 
-@dataclass
+@dataclass(eq=False)
 class ConnectionInfo:
     """连接信息"""
     connection: snowflake.connector.SnowflakeConnection
-    created_at: float
-    last_used: float
+    created_at: float  # time.monotonic() 时间戳
+    last_used: float  # time.monotonic() 时间戳
     status: ConnectionStatus = ConnectionStatus.UNKNOWN
     use_count: int = 0
+    database_id: str = ""
+    cursor: Optional[Any] = None  # 缓存的游标，随连接一起复用，连接关闭时才关闭
+
+
+class SnowflakeRetryExhaustedError(Exception):
+    """可重试的连接相关错误在重试次数耗尽后仍然失败"""
+
+
+class SnowflakePoolExhaustedError(RuntimeError):
+    """连接池已满，暂时无法借出或创建连接"""
 
 
 class SnowflakeConnectionPool:
@@ -45,7 +108,11 @@ class SnowflakeConnectionPool:
                  health_check_interval: int = 300,  # 5分钟
                  max_retries: int = 3,
                  retry_delay: float = 1.0,
-                 retry_backoff: float = 2.0):
+                 retry_backoff: float = 2.0,
+                 retry_max_delay: float = 30.0,
+                 idle_probe_threshold: float = 30.0,
+                 warm_databases: Optional[List[str]] = None,
+                 policy: str = "lifo"):
         """
         初始化连接池
         
@@ -58,7 +125,15 @@ class SnowflakeConnectionPool:
             max_retries: 最大重试次数
             retry_delay: 重试延迟（秒）
             retry_backoff: 重试退避倍数
+            retry_max_delay: 单次重试延迟上限（秒）
+            idle_probe_threshold: 借出前需要探测健康状态的空闲时长（秒）
+            warm_databases: 需要预热的数据库列表，构造时在后台为每个数据库并发预创建 min_connections 个连接
+            policy: 空闲连接借出顺序，"lifo" 优先复用最近归还的连接（空闲连接自然老化淘汰），
+                "fifo" 轮流使用所有连接
         """
+        if policy not in ("lifo", "fifo"):
+            raise ValueError(f"不支持的连接借出策略: {policy}")
+
         self.max_connections = max_connections
         self.min_connections = min_connections
         self.connection_timeout = connection_timeout
@@ -67,37 +142,42 @@ class SnowflakeConnectionPool:
         self.max_retries = max_retries
         self.retry_delay = retry_delay
         self.retry_backoff = retry_backoff
+        self.retry_max_delay = retry_max_delay
+        self.idle_probe_threshold = idle_probe_threshold
+        self._warm_databases = list(warm_databases or [])
+        self.policy = policy
+        self._lifo = policy == "lifo"
+        # 各次重试的延迟上限（带上限的指数退避），只依赖构造参数，预先计算
+        self._retry_delays = [
+            min(retry_max_delay, retry_delay * (retry_backoff ** attempt))
+            for attempt in range(max_retries)
+        ]
         
-        # 连接池和锁
-        self._pool = Queue(maxsize=max_connections)
-        self._pool_lock = threading.Lock()
-        self._active_connections = {}  # 活跃连接字典
+        # 按数据库分片的空闲连接队列：连接在创建时绑定数据库，只能复用给同一数据库的查询；
+        # deque 的 append/popleft 本身是原子操作，借还连接的热路径无需加锁
+        self._routes: Dict[str, deque] = {}
+        # 连接总数上限：创建连接前获取许可，销毁连接时释放
+        self._capacity = threading.BoundedSemaphore(max_connections)
+        # 只在创建/销毁连接时更新连接计数
+        self._count_lock = threading.Lock()
+        self._active_connections: Set[ConnectionInfo] = set()  # 活跃连接集合（按对象身份哈希）
         self._connection_count = 0
         self._closed = False
         
-        # 统计信息
-        self._stats = {
-            'total_created': 0,
-            'total_destroyed': 0,
-            'total_borrowed': 0,
-            'total_returned': 0,
-            'total_health_checks': 0,
-            'total_retries': 0,
-            'current_active': 0
-        }
+        # 统计信息：固定槽位的计数器数组，热路径上只写一个槽位，不做字典键哈希；
+        # 槽位的 += 不是原子操作，多线程并发时经 _incr 在锁内递增，避免丢失计数
+        self._counters = array('Q', [0] * len(_STAT_NAMES))
+        self._stats_lock = threading.Lock()
         
         # 加载环境变量
-        load_dotenv(".env")
+        _load_env()
         
-        # 获取连接参数
+        # 获取连接参数（构造时读取一次环境变量，创建连接时只需补充数据库）
         self._connection_params = self._get_connection_params()
         
-        # 启动健康检查线程
-        self._health_check_thread = threading.Thread(
-            target=self._health_check_worker, 
-            daemon=True
-        )
-        self._health_check_thread.start()
+        # 健康检查线程在创建第一个连接时才启动，close() 时通过事件立即唤醒退出
+        self._shutdown_event = threading.Event()
+        self._health_check_thread = None
         
         # 预创建最小连接数
         self._initialize_pool()
@@ -131,14 +211,16 @@ class SnowflakeConnectionPool:
             },
         }
     
+    def _incr(self, slot: int):
+        """在锁内递增一个统计计数器"""
+        with self._stats_lock:
+            self._counters[slot] += 1
+    
     def _create_connection(self, database_id: str) -> snowflake.connector.SnowflakeConnection:
         """创建新连接"""
         try:
-            params = self._connection_params.copy()
-            params["database"] = database_id
-            
-            conn = snowflake.connector.connect(**params)
-            self._stats['total_created'] += 1
+            conn = snowflake.connector.connect(**self._connection_params, database=database_id)
+            self._incr(_C_CREATED)
             logging.debug(f"创建新的Snowflake连接: {database_id}")
             return conn
             
@@ -147,8 +229,21 @@ class SnowflakeConnectionPool:
             raise
     
     def _is_connection_healthy(self, conn: snowflake.connector.SnowflakeConnection) -> bool:
-        """检查连接健康状态"""
+        """
+        检查连接健康状态
+        
+        驱动通过 HTTPS 短请求与服务端通信，连接对象上没有常驻的 TCP 套接字可供探测；
+        先用本地状态排除已关闭的连接，再优先使用驱动的会话心跳（is_valid），
+        旧版驱动没有该方法时才退回 SELECT 1
+        """
         try:
+            if conn.is_closed():
+                return False
+            
+            is_valid = getattr(conn, "is_valid", None)
+            if is_valid is not None:
+                return bool(is_valid())
+            
             cursor = conn.cursor()
             cursor.execute("SELECT 1")
             cursor.fetchone()
@@ -158,28 +253,105 @@ class SnowflakeConnectionPool:
             logging.debug(f"连接健康检查失败: {e}")
             return False
     
-    def _close_connection(self, conn: snowflake.connector.SnowflakeConnection):
-        """关闭连接"""
+    def _close_connection(self, conn_info: ConnectionInfo):
+        """关闭连接（及其缓存的游标）"""
         try:
-            conn.close()
-            self._stats['total_destroyed'] += 1
+            if conn_info.cursor is not None:
+                conn_info.cursor.close()
+                conn_info.cursor = None
+            conn_info.connection.close()
+            self._incr(_C_DESTROYED)
             logging.debug("连接已关闭")
         except Exception as e:
             logging.warning(f"关闭连接时出错: {e}")
     
+    def _route(self, database_id: str) -> deque:
+        """获取数据库对应的空闲连接队列（dict.setdefault 是原子操作）"""
+        route = self._routes.get(database_id)
+        if route is None:
+            route = self._routes.setdefault(database_id, deque())
+        return route
+    
+    def _evict_idle_connection(self, exclude_database_id: str) -> bool:
+        """连接数已满时，关闭其他数据库的一个空闲连接，为当前数据库腾出容量"""
+        for database_id, route in list(self._routes.items()):
+            if database_id == exclude_database_id:
+                continue
+            try:
+                conn_info = route.popleft()
+            except IndexError:
+                continue
+            self._destroy_connection(conn_info)
+            return True
+        return False
+    
+    def _destroy_connection(self, conn_info: ConnectionInfo):
+        """关闭连接并归还容量许可"""
+        self._close_connection(conn_info)
+        with self._count_lock:
+            self._connection_count -= 1
+        self._capacity.release()
+    
     def _initialize_pool(self):
         """初始化连接池"""
-        # 这里不预创建连接，因为需要database_id
-        # 连接将在首次使用时创建
-        pass
+        # 连接需要database_id，未指定预热数据库时连接将在首次使用时创建
+        if not self._warm_databases:
+            return
+        
+        # 在后台并发建立连接，构造函数不等待登录完成
+        executor = ThreadPoolExecutor(max_workers=_CONNECT_WORKERS)
+        for database_id in self._warm_databases:
+            for _ in range(self.min_connections):
+                executor.submit(self._warm_connection, database_id)
+        executor.shutdown(wait=False)
+    
+    def _warm_connection(self, database_id: str):
+        """预创建一个空闲连接放入池中（连接池已满时跳过）"""
+        if self._closed or not self._capacity.acquire(blocking=False):
+            return
+        try:
+            conn_info = self._open_connection(database_id, time.monotonic())
+        except Exception as e:
+            logging.warning(f"预热连接失败: {database_id}, {e}")
+            return
+        
+        if self._closed:
+            self._destroy_connection(conn_info)
+        else:
+            self._route(database_id).append(conn_info)
+    
+    def _open_connection(self, database_id: str, now: float) -> ConnectionInfo:
+        """在已获取容量许可的前提下创建新连接，创建失败时归还许可"""
+        try:
+            conn = self._create_connection(database_id)
+        except Exception:
+            self._capacity.release()
+            raise
+        conn_info = ConnectionInfo(
+            connection=conn,
+            created_at=now,
+            last_used=now,
+            status=ConnectionStatus.HEALTHY,
+            database_id=database_id
+        )
+        
+        with self._count_lock:
+            self._connection_count += 1
+            if self._health_check_thread is None:
+                self._health_check_thread = threading.Thread(
+                    target=self._health_check_worker, 
+                    daemon=True
+                )
+                self._health_check_thread.start()
+        return conn_info
     
     def _health_check_worker(self):
         """健康检查工作线程"""
-        while not self._closed:
+        while not self._shutdown_event.wait(self.health_check_interval):
             try:
-                time.sleep(self.health_check_interval)
-                if self._closed:
-                    break
+                # 没有任何连接时跳过本轮检查
+                if self._connection_count == 0:
+                    continue
                 
                 self._perform_health_check()
                 
@@ -188,45 +360,49 @@ class SnowflakeConnectionPool:
     
     def _perform_health_check(self):
         """执行健康检查"""
-        current_time = time.time()
+        # 单调时钟不受系统时间调整影响；整轮检查只取一次当前时间
+        now = time.monotonic()
         connections_to_remove = []
         
-        with self._pool_lock:
-            # 检查池中的连接
-            temp_connections = []
-            while not self._pool.empty():
+        # 取出当前所有空闲连接（检查期间借用方只是暂时看不到这些连接），过期连接直接移除
+        pending = []
+        for route in list(self._routes.values()):
+            while True:
                 try:
-                    conn_info = self._pool.get_nowait()
-                    
-                    # 检查连接年龄
-                    if current_time - conn_info.created_at > self.max_connection_age:
-                        connections_to_remove.append(conn_info)
-                        continue
-                    
-                    # 检查连接健康状态
-                    if self._is_connection_healthy(conn_info.connection):
-                        conn_info.status = ConnectionStatus.HEALTHY
-                        temp_connections.append(conn_info)
-                    else:
-                        conn_info.status = ConnectionStatus.UNHEALTHY
-                        connections_to_remove.append(conn_info)
-                        
-                except Empty:
+                    conn_info = route.popleft()
+                except IndexError:
                     break
+                
+                # 检查连接年龄
+                if now - conn_info.created_at > self.max_connection_age:
+                    connections_to_remove.append(conn_info)
+                else:
+                    pending.append(conn_info)
+        
+        # 并发探测连接健康状态，整轮检查耗时约为一次往返而不是 N 次往返
+        if pending:
+            with ThreadPoolExecutor(max_workers=min(_HEALTH_CHECK_WORKERS, len(pending))) as executor:
+                healthy_flags = list(executor.map(
+                    self._is_connection_healthy, [conn_info.connection for conn_info in pending]
+                ))
             
-            # 将健康的连接放回池中
-            for conn_info in temp_connections:
-                self._pool.put(conn_info)
+            for conn_info, healthy in zip(pending, healthy_flags):
+                if healthy:
+                    # 将健康的连接放回所属数据库的池中
+                    conn_info.status = ConnectionStatus.HEALTHY
+                    self._route(conn_info.database_id).append(conn_info)
+                else:
+                    conn_info.status = ConnectionStatus.UNHEALTHY
+                    connections_to_remove.append(conn_info)
         
         # 关闭不健康的连接
         for conn_info in connections_to_remove:
-            self._close_connection(conn_info.connection)
-            self._connection_count -= 1
+            self._destroy_connection(conn_info)
         
         if connections_to_remove:
             logging.info(f"健康检查完成，移除了 {len(connections_to_remove)} 个不健康连接")
         
-        self._stats['total_health_checks'] += 1
+        self._incr(_C_HEALTH_CHECKS)
     
     @contextmanager
     def get_connection(self, database_id: str):
@@ -239,10 +415,21 @@ class SnowflakeConnectionPool:
         Yields:
             snowflake.connector.SnowflakeConnection: 数据库连接
         """
+        with self._lease_connection(database_id) as conn_info:
+            yield conn_info.connection
+    
+    @contextmanager
+    def _lease_connection(self, database_id: str):
+        """借用连接并在结束时归还，产出连接信息（可访问缓存的游标）"""
         conn_info = None
         try:
             conn_info = self._borrow_connection(database_id)
-            yield conn_info.connection
+            yield conn_info
+        except Exception as e:
+            # 连接相关错误说明连接可能已失效，归还时直接销毁，不再放回池中
+            if conn_info and self._is_retryable_error(e):
+                conn_info.status = ConnectionStatus.UNHEALTHY
+            raise
         finally:
             if conn_info:
                 self._return_connection(conn_info)
@@ -252,84 +439,68 @@ class SnowflakeConnectionPool:
         if self._closed:
             raise RuntimeError("连接池已关闭")
         
-        # 尝试从池中获取连接
+        now = time.monotonic()
+        
+        # 尝试从该数据库的空闲连接中获取（归还总是追加到队尾，LIFO 从队尾取、FIFO 从队头取）
         try:
-            conn_info = self._pool.get_nowait()
+            route = self._route(database_id)
+            conn_info = route.pop() if self._lifo else route.popleft()
             
-            # 检查连接是否健康
-            if self._is_connection_healthy(conn_info.connection):
-                conn_info.last_used = time.time()
+            # 最近使用过的连接直接借出，只有空闲较久的连接才用 SELECT 1 探测；
+            # 个别失效的连接由 execute_query_with_retry 的重试兜底
+            idle = now - conn_info.last_used
+            if idle < self.idle_probe_threshold or self._is_connection_healthy(conn_info.connection):
+                conn_info.last_used = now
                 conn_info.use_count += 1
-                self._stats['total_borrowed'] += 1
-                self._stats['current_active'] += 1
+                self._incr(_C_BORROWED)
                 
-                # 将连接添加到活跃连接字典
-                conn_id = id(conn_info.connection)
-                self._active_connections[conn_id] = conn_info
+                # 将连接添加到活跃连接集合
+                self._active_connections.add(conn_info)
                 
                 logging.debug(f"从池中借用连接: {database_id}")
                 return conn_info
             else:
                 # 连接不健康，关闭并创建新连接
-                self._close_connection(conn_info.connection)
-                self._connection_count -= 1
+                self._destroy_connection(conn_info)
                 
-        except Empty:
+        except IndexError:
             # 池中没有可用连接
             pass
         
-        # 创建新连接
-        if self._connection_count < self.max_connections:
-            conn = self._create_connection(database_id)
-            conn_info = ConnectionInfo(
-                connection=conn,
-                created_at=time.time(),
-                last_used=time.time(),
-                status=ConnectionStatus.HEALTHY,
-                use_count=1
-            )
-            
-            self._connection_count += 1
-            self._stats['total_borrowed'] += 1
-            self._stats['current_active'] += 1
+        # 创建新连接（先获取容量许可，不阻塞；已满时回收其他数据库的空闲连接）
+        if self._capacity.acquire(blocking=False) or (
+            self._evict_idle_connection(database_id) and self._capacity.acquire(blocking=False)
+        ):
+            conn_info = self._open_connection(database_id, now)
+            conn_info.use_count = 1
+            self._incr(_C_BORROWED)
             
-            # 将连接添加到活跃连接字典
-            conn_id = id(conn_info.connection)
-            self._active_connections[conn_id] = conn_info
+            # 将连接添加到活跃连接集合
+            self._active_connections.add(conn_info)
             
             logging.debug(f"创建新连接: {database_id}")
             return conn_info
         else:
-            raise RuntimeError("连接池已满，无法创建新连接")
+            raise SnowflakePoolExhaustedError("连接池已满，无法创建新连接")
     
     def _return_connection(self, conn_info: ConnectionInfo):
         """归还连接"""
         try:
-            conn_id = id(conn_info.connection)
-            
-            # 从活跃连接字典中移除
-            if conn_id in self._active_connections:
-                del self._active_connections[conn_id]
-            
-            self._stats['current_active'] -= 1
+            now = time.monotonic()
+            # 从活跃连接集合中移除
+            self._active_connections.discard(conn_info)
             
-            # 检查连接是否仍然健康
-            if (self._is_connection_healthy(conn_info.connection) and 
-                time.time() - conn_info.created_at < self.max_connection_age):
+            # 归还时不探测连接，只丢弃使用中出错或已过期的连接
+            if (conn_info.status != ConnectionStatus.UNHEALTHY and
+                now - conn_info.created_at < self.max_connection_age):
                 
-                # 将连接放回池中
-                try:
-                    self._pool.put_nowait(conn_info)
-                    self._stats['total_returned'] += 1
-                    logging.debug("连接已归还到池中")
-                except:
-                    # 池已满，关闭连接
-                    self._close_connection(conn_info.connection)
-                    self._connection_count -= 1
+                # 将连接放回池中（连接总数受容量许可限制，空闲队列不会超出上限）
+                self._route(conn_info.database_id).append(conn_info)
+                self._incr(_C_RETURNED)
+                logging.debug("连接已归还到池中")
             else:
                 # 连接不健康或过期，关闭它
-                self._close_connection(conn_info.connection)
-                self._connection_count -= 1
+                self._destroy_connection(conn_info)
                 
         except Exception as e:
             logging.error(f"归还连接时出错: {e}")
@@ -345,53 +516,39 @@ class SnowflakeConnectionPool:
         Returns:
             是否可重试
         """
-        error_message = str(error).lower()
-        
-        # 连接相关的错误，可以重试
-        retryable_keywords = [
-            'timeout', 'timed out', 'read timeout', 'connection timeout',
-            'connection reset', 'connection refused', 'connection failed',
-            'network', 'unreachable', 'connection error', 'socket timeout',
-            'broken pipe', 'connection aborted', 'connection lost',
-            'temporary failure', 'service unavailable', 'server error',
-            'internal server error', '500', '502', '503', '504',
-            'retry', 'throttled', 'rate limit', 'too many requests'
-        ]
-        
-        # 检查是否包含可重试的关键词
-        for keyword in retryable_keywords:
-            if keyword in error_message:
-                return True
-        
-        # 检查具体的异常类型
-        if hasattr(error, '__class__'):
-            error_type = error.__class__.__name__.lower()
-            retryable_types = [
-                'timeout', 'connectionerror', 'networkerror', 'readtimeout',
-                'connectiontimeout', 'sockettimeout', 'httperror'
-            ]
-            
-            for error_type_keyword in retryable_types:
-                if error_type_keyword in error_type:
-                    return True
+        # 驱动层的连接错误（包括复用了已失效的连接）
+        if isinstance(error, (OperationalError, InterfaceError)):
+            return True
         
-        # 非连接相关错误，不重试
-        return False
+        # 检查错误信息和异常类型名是否包含可重试的关键词，否则为非连接相关错误，不重试
+        return bool(
+            _RETRYABLE_MSG_RE.search(str(error))
+            or _RETRYABLE_TYPE_RE.search(type(error).__name__)
+        )
 
     def execute_query_with_retry(self, 
                                 sql_query: str, 
                                 database_id: str, 
-                                log: bool = False) -> List[Dict[str, Any]]:
+                                log: bool = False,
+                                result_format: str = "dict",
+                                expect_results: bool = True):
         """
         执行SQL查询，只对连接相关错误进行重试
         
+        错误只分类一次：不可重试的错误在首次失败时原样抛出；
+        可重试的错误重试耗尽后抛出 SnowflakeRetryExhaustedError
+        
         Args:
             sql_query: SQL查询语句
             database_id: 数据库ID
             log: 是否记录日志
+            result_format: 结果格式，"dict" 返回字典列表；"arrow" 直接返回驱动下载的
+                Arrow 列式表（pyarrow.Table），不逐行构造Python对象，适用于大结果集
+            expect_results: 为 False 时（DDL/DML语句）不读取结果集，直接返回影响行数
             
         Returns:
-            查询结果列表
+            查询结果列表，result_format="arrow" 时的 pyarrow.Table，
+            或 expect_results=False 时的影响行数
         """
         if not sql_query or not sql_query.strip():
             raise ValueError("SQL查询不能为空")
@@ -399,6 +556,12 @@ class SnowflakeConnectionPool:
         if not database_id or not database_id.strip():
             raise ValueError("数据库ID不能为空")
         
+        if result_format not in ("dict", "arrow"):
+            raise ValueError(f"不支持的结果格式: {result_format}")
+        
+        if result_format == "arrow":
+            import pyarrow as pa
+        
         last_exception = None
         
         for attempt in range(self.max_retries + 1):
@@ -408,26 +571,45 @@ class SnowflakeConnectionPool:
                 elif log:
                     logging.info(f"执行查询: {sql_query[:100]}...")
                 
-                with self.get_connection(database_id) as conn:
-                    cursor = conn.cursor()
+                with self._lease_connection(database_id) as conn_info:
+                    # 复用连接上缓存的游标，不为每次查询分配新游标
+                    cursor = conn_info.cursor
+                    if cursor is None:
+                        cursor = conn_info.cursor = conn_info.connection.cursor()
                     cursor.execute(sql_query)
                     
-                    # 获取列名
-                    columns = [desc[0] for desc in cursor.description] if cursor.description else []
+                    # 不需要结果时（DDL/DML）跳过结果读取，直接返回影响行数
+                    if not expect_results:
+                        return cursor.rowcount
                     
-                    # 获取所有结果
-                    rows = cursor.fetchall()
+                    if result_format == "arrow":
+                        # 空结果时 fetch_arrow_all 返回 None
+                        table = cursor.fetch_arrow_all()
+                        if table is None:
+                            table = pa.table({desc[0]: [] for desc in cursor.description or ()})
+                        
+                        if log:
+                            logging.info(f"查询完成，返回{table.num_rows}行数据")
+                        
+                        return table
                     
-                    # 将结果转换为字典列表
-                    results = []
-                    for row in rows:
-                        row_dict = {}
-                        for i, value in enumerate(row):
-                            column_name = columns[i] if i < len(columns) else f"column_{i}"
-                            row_dict[column_name] = value
-                        results.append(row_dict)
+                    # 语句没有结果集时不再读取结果
+                    if cursor.description is None:
+                        return []
+                    
+                    # 获取列名
+                    columns = tuple(desc[0] for desc in cursor.description)
                     
-                    cursor.close()
+                    # 分批读取结果并转换为字典列表，不会同时持有完整的元组列表和字典列表
+                    results = []
+                    while True:
+                        rows = cursor.fetchmany(_FETCH_BATCH_SIZE)
+                        if not rows:
+                            break
+                        if not results and len(rows[0]) > len(columns):
+                            # 列名少于行宽时只在第一批补齐一次缺失的列名，之后 zip 不会截断数据
+                            columns += tuple(f"column_{i}" for i in range(len(columns), len(rows[0])))
+                        results.extend(dict(zip(columns, row)) for row in rows)
                     
                     if log:
                         logging.info(f"查询完成，返回{len(results)}行数据")
@@ -444,35 +626,35 @@ class SnowflakeConnectionPool:
                     raise e
                 
                 # 连接相关错误，进行重试
-                self._stats['total_retries'] += 1
+                self._incr(_C_RETRIES)
                 
                 if attempt < self.max_retries:
-                    # 计算重试延迟（指数退避 + 随机抖动）
-                    delay = self.retry_delay * (self.retry_backoff ** attempt)
-                    jitter = random.uniform(0, delay * 0.1)  # 10%的抖动
-                    total_delay = delay + jitter
+                    # 重试延迟（带上限的指数退避 + 全抖动），并发请求同时失败时不会同步重试
+                    total_delay = random.random() * self._retry_delays[attempt]
                     
                     logging.warning(f"连接相关错误，第{attempt + 1}次尝试失败: {e}, {total_delay:.2f}秒后重试")
                     time.sleep(total_delay)
                 else:
                     logging.error(f"连接相关错误，已重试{self.max_retries}次仍失败: {e}")
         
-        # 重试耗尽，抛出最后一个异常
+        # 重试耗尽，抛出独立的异常类型，调用方可以区分瞬时错误耗尽和不可重试的错误
         if last_exception:
-            raise Exception(f"执行Snowflake查询失败，已重试{self.max_retries}次: {last_exception}")
+            raise SnowflakeRetryExhaustedError(
+                f"执行Snowflake查询失败，已重试{self.max_retries}次: {last_exception}"
+            ) from last_exception
         else:
             raise Exception("执行Snowflake查询失败，原因未知")
     
     def get_stats(self) -> Dict[str, Any]:
-        """获取连接池统计信息"""
-        with self._pool_lock:
-            return {
-                **self._stats,
-                'pool_size': self._pool.qsize(),
-                'total_connections': self._connection_count,
-                'max_connections': self.max_connections,
-                'min_connections': self.min_connections
-            }
+        """获取连接池统计信息（不加锁读取，仅用于监控）"""
+        return {
+            **dict(zip(_STAT_NAMES, self._counters)),
+            'current_active': len(self._active_connections),
+            'pool_size': sum(len(route) for route in list(self._routes.values())),
+            'total_connections': self._connection_count,
+            'max_connections': self.max_connections,
+            'min_connections': self.min_connections
+        }
     
     def close(self):
         """关闭连接池"""
@@ -481,17 +663,23 @@ class SnowflakeConnectionPool:
         
         self._closed = True
         
+        # 唤醒并等待健康检查线程退出
+        self._shutdown_event.set()
+        if self._health_check_thread is not None and self._health_check_thread is not threading.current_thread():
+            self._health_check_thread.join(timeout=1)
+        
         # 关闭所有池中的连接
-        while not self._pool.empty():
-            try:
-                conn_info = self._pool.get_nowait()
-                self._close_connection(conn_info.connection)
-            except Empty:
-                break
+        for route in list(self._routes.values()):
+            while True:
+                try:
+                    conn_info = route.popleft()
+                except IndexError:
+                    break
+                self._close_connection(conn_info)
         
         # 关闭所有活跃连接
-        for conn_info in self._active_connections.values():
-            self._close_connection(conn_info.connection)
+        for conn_info in list(self._active_connections):
+            self._close_connection(conn_info)
         
         self._active_connections.clear()
         self._connection_count = 0
@@ -521,8 +709,10 @@ def snowflake_sql_query_with_pool(
     database_id: str, 
     timeout: int = 60, 
     log: bool = False,
-    max_connections: int = 16
-) -> List[Dict[str, Any]]:
+    max_connections: int = 16,
+    result_format: str = "dict",
+    expect_results: bool = True
+):
     """
     使用连接池执行Snowflake SQL查询
     
@@ -532,12 +722,15 @@ def snowflake_sql_query_with_pool(
         timeout: 超时时间
         log: 是否记录日志
         max_connections: 最大连接数
+        result_format: 结果格式，"dict" 或 "arrow"
+        expect_results: 为 False 时（DDL/DML语句）不读取结果集，直接返回影响行数
         
     Returns:
-        查询结果列表
+        查询结果列表，result_format="arrow" 时的 pyarrow.Table，
+        或 expect_results=False 时的影响行数
     """
     pool = get_global_pool(max_connections)
-    return pool.execute_query_with_retry(sql_query, database_id, log)
+    return pool.execute_query_with_retry(sql_query, database_id, log, result_format, expect_results)
 
 
 def close_global_pool():
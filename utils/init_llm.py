@@ -1,18 +1,38 @@
 from langchain.chat_models import init_chat_model
 import os
 import logging
+import threading
+
+# 按 (model, model_provider) 缓存已创建的LLM实例，进程内复用
+_llm_cache = {}
+_llm_cache_lock = threading.Lock()
 
 def initialize_llm(test=False) :
     """
     初始化LLM实例
     
+    同一模型只在首次调用时创建实例（连接测试也只在首次创建时进行），之后直接返回缓存的实例
+    
     Returns:
         LLM实例或None
     """
     # 读取环境变量
     model = os.getenv("LLM_MODEL") or "gpt-4o-mini"
+    key = (model, "openai")
     
-    
+    with _llm_cache_lock:
+        llm = _llm_cache.get(key)
+        if llm is not None:
+            return llm
+        
+        llm = _create_llm(model, test)
+        # 初始化失败不缓存，下次调用时重试
+        if llm is not None:
+            _llm_cache[key] = llm
+        return llm
+
+def _create_llm(model, test) :
+    """创建LLM实例"""
     try:
         
         llm = init_chat_model(model=model, model_provider="openai")
@@ -1,34 +1,95 @@
 import os
 import json
 import logging
+import hashlib
+import sqlite3
+import threading
+import operator
+import heapq
 import numpy as np
 from typing import List, Dict, Tuple, Optional
 from pathlib import Path
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 import faiss
-from openai import OpenAI
+from openai import OpenAI, BadRequestError
 from tqdm import tqdm
 from utils.CypherExecutor import CypherExecutor
 
+try:
+    import orjson
+except ImportError:  # 未安装orjson时退回标准库json
+    orjson = None
+
+
+def _dumps_json_line(obj) -> bytes:
+    """将对象序列化为一行UTF-8编码的JSON"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+
+_loads_json_line = orjson.loads if orjson is not None else json.loads
+
+try:
+    import tiktoken
+except ImportError:  # 未安装tiktoken时按UTF-8字节数估算token数
+    tiktoken = None
+
+# 向量化文本用到的字段属性及缺失时的默认值
+_FIELD_TEXT_DEFAULTS = {
+    'name': 'unknown',
+    'type': 'unknown',
+    'table': 'unknown',
+    'database': 'unknown',
+    'schema': '',
+    'description': '',
+}
+_get_field_text_values = operator.itemgetter('name', 'type', 'table', 'schema', 'database', 'description')
+
+def _progress_bar(iterable=None, total=None, **kwargs) -> tqdm:
+    """创建刷新频率较低的进度条：至少间隔1秒、约每1%进度才重绘一次"""
+    if total is None and iterable is not None and hasattr(iterable, '__len__'):
+        total = len(iterable)
+    miniters = max(1, total // 100) if total else 1
+    return tqdm(iterable, total=total, mininterval=1.0, miniters=miniters, **kwargs)
+
+
+# 向量化时每次加入索引的字段行数，限制索引之外同时驻留内存的向量数
+_INDEX_ADD_CHUNK_ROWS = 8192
+
+# Field查询的返回列，列名直接使用字段信息的键，查询结果无需逐行转换
+_FIELD_RETURN_CLAUSE = """RETURN elementId(f) AS id,
+               f.name AS name,
+               f.type AS `type`,
+               f.database AS database,
+               f.table AS `table`,
+               coalesce(f.description, '') AS description,
+               coalesce(f.schema, '') AS schema"""
+
 
 class VectorizedFieldManager:
-    def __init__(self, enable_info_logging=True):
+    def __init__(self, enable_info_logging=True, embedding_concurrency: int = 8):
         """
         初始化向量化字段管理器
         
         Args:
             enable_info_logging (bool): 是否启用info级别日志
+            embedding_concurrency (int): 同时进行的向量化请求数，默认8
         """
         self.enable_info_logging = enable_info_logging
+        self.embedding_concurrency = embedding_concurrency
         self.setup_logging()
         
         # 加载环境变量
         load_dotenv(".env")
         
-        # 初始化OpenAI客户端
+        # 初始化OpenAI客户端（客户端线程安全，并发请求共用；触发限流时由客户端自动退避重试）
         self.openai_client = OpenAI(
             api_key=os.getenv("OPENAI_API_KEY"),
-            base_url=os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1")
+            base_url=os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1"),
+            max_retries=5
         )
         
         # 初始化数据库连接
@@ -38,8 +99,29 @@ class VectorizedFieldManager:
         self.vector_dir = Path("resource/vector")
         self.vector_dir.mkdir(parents=True, exist_ok=True)
         
-        # 向量维度
+        # 向量模型及维度
+        self.embedding_model = "text-embedding-3-small"
         self.embedding_dim = 1536  # text-embedding-3-small的维度
+        # 单次向量化请求的token预算，批次按token数而不是字段数打包
+        self.embedding_batch_tokens = 7500
+        self._token_encoder = None
+        if tiktoken is not None:
+            try:
+                self._token_encoder = tiktoken.encoding_for_model(self.embedding_model)
+            except Exception as e:  # 编码表需要下载，离线时退回估算
+                logging.warning(f"Failed to load tokenizer for {self.embedding_model}, estimating token counts: {e}")
+        
+        # 向量缓存：按 sha256(向量化文本 + 模型名) 保存已生成的向量，重复向量化时未变化的字段不再请求API
+        self._embedding_cache = sqlite3.connect(
+            str(self.vector_dir / "embed_cache.db"), check_same_thread=False
+        )
+        self._embedding_cache.execute(
+            "CREATE TABLE IF NOT EXISTS embed_cache (hash BLOB PRIMARY KEY, vec BLOB NOT NULL)"
+        )
+        self._embedding_cache_lock = threading.Lock()
+        
+        # 已加载的索引和元数据缓存，键包含文件修改时间，重新向量化后自动失效
+        self._load_index_cached = lru_cache(maxsize=32)(self._read_database_index)
         
     def setup_logging(self):
         """设置日志配置"""
@@ -71,7 +153,7 @@ class VectorizedFieldManager:
         ORDER BY f.database
         """
         
-        success, results = self.cypher_executor.execute_transactional_cypher(cypher_query)
+        success, results = self.cypher_executor.execute_transactional_read(cypher_query)
         
         if not success:
             logging.error("Failed to fetch database list")
@@ -99,71 +181,107 @@ class VectorizedFieldManager:
         
         parameters = {"database": database}
         self._log_info(f"Getting field count for database {database}")
-        success, results = self.cypher_executor.execute_transactional_cypher(cypher_query, parameters)
+        success, count = self.cypher_executor.execute_transactional_read(
+            cypher_query, parameters, consume_as="scalar"
+        )
         
-        if not success or not results:
+        if not success or count is None:
             logging.error(f"Failed to get field count for database {database}")
             return 0
         
-        count = results[0].get('total_count', 0)
         self._log_info(f"Database {database} has {count} fields")
         return count
     
     def get_database_fields_paginated(self, database: str, page_size: int = 100, 
-                                    offset: int = 0) -> List[Dict]:
+                                    offset: int = 0, *,
+                                    after: Optional[Tuple[str, str, str]] = None) -> List[Dict]:
         """
         分页获取指定数据库的字段信息
         
+        按 (table, name, id) 排序。传入 after 时使用游标（键集）分页，从上一页最后一个字段之后
+        继续读取，不再用 SKIP 重复扫描前面所有页的数据；逐页读取全部字段时应优先使用 after
+        
         Args:
             database (str): 数据库名称
             page_size (int): 每页大小，默认100
-            offset (int): 偏移量，默认0
+            offset (int): 偏移量，默认0；与 after 同时指定时在游标之后再跳过 offset 个字段
+            after (Tuple[str, str, str], optional): 仅限关键字参数，上一页最后一个字段的游标，
+                见 field_page_cursor；为None时从第一页开始
             
         Returns:
             List[Dict]: 字段信息列表
         """
-        cypher_query = """
+        cypher_query = f"""
         MATCH (f:Field)
         WHERE f.database = $database
-        RETURN elementId(f) as field_id, 
-               f.name as field_name, 
-               f.type as field_type, 
-               f.database as database, 
-               f.table as table_name, 
-               f.description as description,
-               f.schema as schema
-        ORDER BY f.table, f.name
+          AND ($after_table IS NULL
+               OR coalesce(f.table, '') > $after_table
+               OR (coalesce(f.table, '') = $after_table
+                   AND (coalesce(f.name, '') > $after_name
+                        OR (coalesce(f.name, '') = $after_name AND elementId(f) > $after_id))))
+        {_FIELD_RETURN_CLAUSE}
+        ORDER BY coalesce(f.table, ''), coalesce(f.name, ''), elementId(f)
         SKIP $offset
         LIMIT $page_size
         """
         
+        after_table, after_name, after_id = after if after is not None else (None, None, None)
         parameters = {
             "database": database,
             "page_size": page_size,
-            "offset": offset
+            "offset": offset,
+            "after_table": after_table,
+            "after_name": after_name,
+            "after_id": after_id
         }
         
-        self._log_info(f"Querying fields for database {database}, offset: {offset}, page_size: {page_size}")
-        success, results = self.cypher_executor.execute_transactional_cypher(cypher_query, parameters)
+        self._log_info(f"Querying fields for database {database}, offset: {offset}, after: {after}, page_size: {page_size}")
+        success, results = self.cypher_executor.execute_transactional_read(cypher_query, parameters)
         
         if not success:
-            logging.error(f"Failed to fetch fields for database {database} (offset: {offset})")
+            logging.error(f"Failed to fetch fields for database {database} (offset: {offset}, after: {after})")
             return []
         
-        fields = []
+        # 查询结果的列名即字段信息的键，直接返回
+        return results
+    
+    @staticmethod
+    def field_page_cursor(field_info: Dict) -> Tuple[str, str, str]:
+        """返回字段作为分页游标的排序键 (table, name, id)"""
+        return field_info.get('table') or '', field_info.get('name') or '', field_info['id']
+    
+    def get_all_fields_single_query(self, target_databases: List[str] = None) -> Dict[str, List[Dict]]:
+        """
+        一次查询获取Field节点并按database分组，不再逐库计数和分页
+        
+        Args:
+            target_databases (List[str], optional): 目标数据库列表，如果为None则获取所有数据库
+            
+        Returns:
+            Dict[str, List[Dict]]: 按数据库分类的字段信息；查询失败时返回None
+        """
+        cypher_query = f"""
+        MATCH (f:Field)
+        WHERE $databases IS NULL OR f.database IN $databases
+        {_FIELD_RETURN_CLAUSE}
+        ORDER BY f.database, f.table, f.name
+        """
+        
+        parameters = {"databases": target_databases}
+        self._log_info(f"Querying fields for {len(target_databases) if target_databases is not None else 'all'} databases in a single query")
+        success, results = self.cypher_executor.execute_transactional_read(cypher_query, parameters)
+        
+        if not success:
+            logging.error("Failed to fetch fields")
+            return None
+        
+        fields_by_database = {database: [] for database in target_databases or []}
         for result in results:
-            field_info = {
-                'id': result.get('field_id'),
-                'name': result.get('field_name'),
-                'type': result.get('field_type'),
-                'database': result.get('database'),
-                'table': result.get('table_name'),
-                'description': result.get('description', ''),
-                'schema': result.get('schema', '')
-            }
-            fields.append(field_info)
+            database = result.get('database')
+            if database:
+                fields_by_database.setdefault(database, []).append(result)
         
-        return fields
+        return fields_by_database
     
     def get_all_database_fields(self, database: str, page_size: int = 100, 
                               show_progress: bool = True) -> List[Dict]:
@@ -185,7 +303,7 @@ class VectorizedFieldManager:
             return []
         
         all_fields = []
-        offset = 0
+        after = None
         
         # 计算总页数
         total_pages = (total_count + page_size - 1) // page_size
@@ -193,25 +311,25 @@ class VectorizedFieldManager:
         # 使用tqdm显示分页进度
         page_iter = range(total_pages)
         if show_progress:
-            page_iter = tqdm(page_iter, desc=f"加载 {database} 字段", unit="页")
+            page_iter = _progress_bar(page_iter, desc=f"加载 {database} 字段", unit="页")
         
         for page_num in page_iter:
             # 获取当前页的字段
-            fields = self.get_database_fields_paginated(database, page_size, offset)
+            fields = self.get_database_fields_paginated(database, page_size, after=after)
             
             if not fields:
-                logging.warning(f"No fields returned for database {database} at offset {offset}")
+                logging.warning(f"No fields returned for database {database} after {after}")
                 break
             
             all_fields.extend(fields)
-            offset += page_size
+            after = self.field_page_cursor(fields[-1])
             
-            # 更新进度条描述
+            # 更新进度条描述（随下次重绘显示，不单独刷新）
             if show_progress:
                 page_iter.set_postfix({
                     '已加载': len(all_fields),
                     '总计': total_count
-                })
+                }, refresh=False)
         
         self._log_info(f"Successfully loaded {len(all_fields)} fields for database {database}")
         return all_fields
@@ -219,47 +337,35 @@ class VectorizedFieldManager:
     def get_all_field_nodes(self, target_databases: List[str] = None, 
                           page_size: int = 100, show_progress: bool = True) -> Dict[str, List[Dict]]:
         """
-        分页获取Field节点，按database分类，支持进度显示
+        获取Field节点，按database分类，支持进度显示
+        
+        所有数据库的字段通过一次查询获取后在客户端分组
         
         Args:
             target_databases (List[str], optional): 目标数据库列表，如果为None则获取所有数据库
-            page_size (int): 每页大小，默认100
+            page_size (int): 保留参数，兼容旧调用；字段不再分页获取
             show_progress (bool): 是否显示进度，默认True
             
         Returns:
             Dict[str, List[Dict]]: 按数据库分类的字段信息
         """
-        # 获取数据库列表
-        if target_databases is None:
-            databases = self.get_database_list()
-        else:
-            databases = target_databases
-        
-        if not databases:
+        if target_databases is not None and not target_databases:
             logging.error("No databases found")
             return {}
         
         if show_progress:
-            print(f"开始获取 {len(databases)} 个数据库的字段信息...")
+            target_text = f"{len(target_databases)} 个数据库" if target_databases is not None else "所有数据库"
+            print(f"开始获取 {target_text}的字段信息...")
         
-        fields_by_database = {}
+        fields_by_database = self.get_all_fields_single_query(target_databases)
         
-        for i, database in enumerate(databases, 1):
-            if show_progress:
-                print(f"\n[{i}/{len(databases)}] 处理数据库: {database}")
-            
-            try:
-                fields = self.get_all_database_fields(database, page_size, show_progress)
-                fields_by_database[database] = fields
-                
-                if show_progress:
-                    print(f"  ✅ 完成数据库 {database}: {len(fields)} 个字段")
-                    
-            except Exception as e:
-                logging.error(f"Failed to load fields for database {database}: {e}")
-                fields_by_database[database] = []
-                if show_progress:
-                    print(f"  ❌ 数据库 {database} 加载失败: {e}")
+        if not fields_by_database:
+            logging.error("No databases found")
+            return {}
+        
+        if show_progress:
+            for database, fields in fields_by_database.items():
+                print(f"  ✅ 完成数据库 {database}: {len(fields)} 个字段")
         
         total_fields = sum(len(fields) for fields in fields_by_database.values())
         self._log_info(f"Retrieved {total_fields} fields from {len(fields_by_database)} databases")
@@ -280,25 +386,28 @@ class VectorizedFieldManager:
         Returns:
             str: 格式化的向量化文本
         """
-        field_name = field_info.get('name', 'unknown')
-        field_type = field_info.get('type', 'unknown')
-        table_name = field_info.get('table', 'unknown')
-        database = field_info.get('database', 'unknown')
-        schema = field_info.get('schema', '')
-        description = field_info.get('description', '').strip()
-        
-        # 构建完整的表名（包含schema）
-        if schema and schema.strip():
-            full_table_name = f"{schema}.{table_name}"
-        else:
-            full_table_name = table_name
-        
-        if description:
-            desc_text = f"Description: {description}"
-        else:
-            desc_text = "No description available."
+        return self.format_fields_for_vectorization([{**_FIELD_TEXT_DEFAULTS, **field_info}])[0]
+    
+    def format_fields_for_vectorization(self, fields: List[Dict]) -> List[str]:
+        """
+        批量将字段信息格式化为向量化文本
         
-        return f"Field {field_name} (type: {field_type}), from table {full_table_name} in database {database}. {desc_text}"
+        Args:
+            fields (List[Dict]): 字段信息列表，需包含 name/type/table/database/schema/description
+            
+        Returns:
+            List[str]: 与字段一一对应的向量化文本
+        """
+        texts = []
+        for field_name, field_type, table_name, schema, database, description in map(_get_field_text_values, fields):
+            # 构建完整的表名（包含schema）
+            full_table_name = f"{schema}.{table_name}" if schema and schema.strip() else table_name
+            description = (description or '').strip()
+            desc_text = f"Description: {description}" if description else "No description available."
+            texts.append(
+                f"Field {field_name} (type: {field_type}), from table {full_table_name} in database {database}. {desc_text}"
+            )
+        return texts
     
     def get_embeddings(self, texts: List[str]) -> List[List[float]]:
         """
@@ -312,49 +421,245 @@ class VectorizedFieldManager:
         """
         try:
             response = self.openai_client.embeddings.create(
-                model="text-embedding-3-small",
+                model=self.embedding_model,
                 input=texts
             )
             
             embeddings = [data.embedding for data in response.data]
             self._log_info(f"Generated embeddings for {len(texts)} texts")
             return embeddings
+        
+        except BadRequestError as e:
+            if len(texts) <= 1:
+                logging.error(f"Failed to generate embeddings: {e}")
+                return []
+            # 请求超出接口限制时拆成两半重试
+            logging.warning(f"Embedding request for {len(texts)} texts rejected, retrying in halves: {e}")
+            mid = len(texts) // 2
+            first = self.get_embeddings(texts[:mid])
+            second = self.get_embeddings(texts[mid:]) if first else []
+            return first + second if second else []
             
         except Exception as e:
             logging.error(f"Failed to generate embeddings: {e}")
             return []
     
-    def build_faiss_index(self, embeddings: List[List[float]]) -> faiss.IndexFlatIP:
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """
+        计算每条文本的token数，未加载分词器时按UTF-8字节数保守估算
+        
+        Args:
+            texts (List[str]): 文本列表
+            
+        Returns:
+            List[int]: 与 texts 一一对应的token数
+        """
+        if self._token_encoder is not None:
+            return [len(tokens) for tokens in self._token_encoder.encode_ordinary_batch(texts)]
+        # 英文约每4字节一个token，中文约每3字节一个token，按3字节估算不会低估
+        return [len(text.encode('utf-8')) // 3 + 1 for text in texts]
+    
+    def pack_embedding_batches(self, texts: List[str], max_batch_size: int) -> List[List[str]]:
+        """
+        按token数贪心打包向量化批次：每批token总数不超过 embedding_batch_tokens，
+        文本数不超过 max_batch_size；单条超出预算的文本单独成批
+        
+        Args:
+            texts (List[str]): 待向量化的文本列表
+            max_batch_size (int): 每批最多文本数
+            
+        Returns:
+            List[List[str]]: 按原顺序划分的批次
+        """
+        batches = []
+        batch, batch_tokens = [], 0
+        for text, tokens in zip(texts, self.count_tokens(texts)):
+            if batch and (batch_tokens + tokens > self.embedding_batch_tokens or len(batch) >= max_batch_size):
+                batches.append(batch)
+                batch, batch_tokens = [], 0
+            batch.append(text)
+            batch_tokens += tokens
+        if batch:
+            batches.append(batch)
+        return batches
+    
+    def _embedding_cache_key(self, text: str) -> bytes:
+        """向量缓存键：向量化文本和模型名的sha256"""
+        return hashlib.sha256(f"{text}|{self.embedding_model}".encode('utf-8')).digest()
+    
+    def get_cached_embeddings(self, texts: List[str]) -> Dict[bytes, np.ndarray]:
+        """
+        从向量缓存中查询文本的向量
+        
+        Args:
+            texts (List[str]): 待查询的文本列表
+            
+        Returns:
+            Dict[bytes, np.ndarray]: 命中的缓存键到向量的映射
+        """
+        keys = list({self._embedding_cache_key(text) for text in texts})
+        cached = {}
+        
+        with self._embedding_cache_lock:
+            # 分段查询，避免超过SQLite的参数个数上限
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._embedding_cache.execute(
+                    f"SELECT hash, vec FROM embed_cache WHERE hash IN ({placeholders})", chunk
+                ).fetchall()
+                for key, vec in rows:
+                    cached[key] = np.frombuffer(vec, dtype=np.float32)
+        
+        return cached
+    
+    def put_cached_embeddings(self, texts: List[str], embeddings: List[List[float]]):
+        """
+        将新生成的向量写入向量缓存
+        
+        Args:
+            texts (List[str]): 文本列表
+            embeddings (List[List[float]]): 与文本一一对应的向量列表
+        """
+        rows = [
+            (self._embedding_cache_key(text), np.asarray(embedding, dtype=np.float32).tobytes())
+            for text, embedding in zip(texts, embeddings)
+        ]
+        with self._embedding_cache_lock:
+            with self._embedding_cache:
+                self._embedding_cache.executemany(
+                    "INSERT OR REPLACE INTO embed_cache (hash, vec) VALUES (?, ?)", rows
+                )
+    
+    def create_faiss_index(self) -> faiss.Index:
+        """
+        创建空的FAISS索引，向量可分批加入
+        
+        使用HNSW图索引，检索复杂度随字段数近似对数增长，而不是暴力扫描全部向量；
+        向量以float16存储，索引文件和检索时读取的内存减半，检索时自动还原为float32计算。
+        float16量化无需训练，创建后即可直接 add
+        
+        Returns:
+            faiss.Index: 空的FAISS索引（归一化后的内积即余弦相似度）
+        """
+        index = faiss.IndexHNSWSQ(
+            self.embedding_dim, faiss.ScalarQuantizer.QT_fp16, 32, faiss.METRIC_INNER_PRODUCT
+        )
+        index.hnsw.efConstruction = 64
+        index.hnsw.efSearch = 64
+        return index
+    
+    def build_faiss_index(self, embeddings, normalized: bool = False) -> faiss.Index:
         """
         构建FAISS索引
         
         Args:
-            embeddings (List[List[float]]): 向量列表
+            embeddings (np.ndarray | List[List[float]]): 向量数组或向量列表；
+                float32数组会被原地归一化，不再复制
+            normalized (bool): 向量是否已归一化，为True时跳过归一化，默认False
             
         Returns:
-            faiss.IndexFlatIP: FAISS索引
+            faiss.Index: FAISS索引
         """
-        embeddings_array = np.array(embeddings, dtype=np.float32)
+        embeddings_array = np.ascontiguousarray(embeddings, dtype=np.float32)
         
         # 归一化向量以使用内积进行余弦相似度计算
-        faiss.normalize_L2(embeddings_array)
+        if not normalized:
+            faiss.normalize_L2(embeddings_array)
         
-        # 创建索引
-        index = faiss.IndexFlatIP(self.embedding_dim)
+        index = self.create_faiss_index()
         index.add(embeddings_array)
         
         self._log_info(f"Built FAISS index with {index.ntotal} vectors")
         return index
     
+    def embed_texts(self, texts: List[str], embedding_batch_size: int = 2048,
+                    progress=None) -> Optional[np.ndarray]:
+        """
+        向量化一组文本并归一化，优先使用向量缓存，未命中的文本并发请求API
+        
+        Args:
+            texts (List[str]): 待向量化的文本列表
+            embedding_batch_size (int): 每批最多文本数
+            progress (tqdm, optional): 进度条，按已得到向量的文本行数更新
+            
+        Returns:
+            Optional[np.ndarray]: 形状为 (len(texts), embedding_dim) 的归一化向量，任一批次失败时返回None
+        """
+        # 向量直接写入预分配的数组，不再先构造嵌套列表再整体复制
+        embeddings_buf = np.empty((len(texts), self.embedding_dim), dtype=np.float32)
+        cache_keys = [self._embedding_cache_key(text) for text in texts]
+        rows_by_key = {}
+        for row, key in enumerate(cache_keys):
+            rows_by_key.setdefault(key, []).append(row)
+        
+        # 先查向量缓存，只为未命中的文本请求API；
+        # 向量在写入缓冲区前按批归一化，构建索引时不再对整个数组做一遍归一化
+        cached_embeddings = self.get_cached_embeddings(texts)
+        if cached_embeddings:
+            cached_array = np.array(list(cached_embeddings.values()), dtype=np.float32)
+            faiss.normalize_L2(cached_array)
+            hit_rows = 0
+            for key, embedding in zip(cached_embeddings, cached_array):
+                rows = rows_by_key[key]
+                embeddings_buf[rows] = embedding
+                hit_rows += len(rows)
+            if progress is not None:
+                progress.update(hit_rows)
+        miss_texts = list(dict.fromkeys(
+            text for text, key in zip(texts, cache_keys) if key not in cached_embeddings
+        ))
+        self._log_info(f"Embedding cache hits: {len(texts) - len(miss_texts)}/{len(texts)}")
+        if not miss_texts:
+            return embeddings_buf
+        
+        # 分批处理向量化，按token数打包，短文本不再浪费单次请求的容量
+        text_batches = self.pack_embedding_batches(miss_texts, embedding_batch_size)
+        
+        # 并发发送各批次的向量化请求（耗时主要在网络往返），结果按文本写回对应的行以保持顺序
+        with ThreadPoolExecutor(max_workers=max(1, min(self.embedding_concurrency, len(text_batches)))) as executor:
+            futures = {
+                executor.submit(self.get_embeddings, batch_texts): batch_num
+                for batch_num, batch_texts in enumerate(text_batches)
+            }
+            
+            for future in as_completed(futures):
+                batch_num = futures[future]
+                batch_texts = text_batches[batch_num]
+                batch_embeddings = future.result()
+                if not batch_embeddings or len(batch_embeddings) != len(batch_texts):
+                    logging.error(f"Failed to generate embeddings for batch {batch_num + 1}")
+                    # 取消尚未开始的批次
+                    for pending in futures:
+                        pending.cancel()
+                    return None
+                
+                batch_array = np.array(batch_embeddings, dtype=np.float32)
+                faiss.normalize_L2(batch_array)
+                batch_rows = 0
+                for text, embedding in zip(batch_texts, batch_array):
+                    rows = rows_by_key[self._embedding_cache_key(text)]
+                    embeddings_buf[rows] = embedding
+                    batch_rows += len(rows)
+                self.put_cached_embeddings(batch_texts, batch_array)
+                
+                if progress is not None:
+                    progress.update(batch_rows)
+        
+        return embeddings_buf
+    
     def save_database_vectors(self, database: str, page_size: int = 100, 
-                            embedding_batch_size: int = 50, show_progress: bool = True) -> bool:
+                            embedding_batch_size: int = 2048, show_progress: bool = True) -> bool:
         """
         为单个数据库保存向量索引和元数据，支持分页和批量处理
         
+        字段按 _INDEX_ADD_CHUNK_ROWS 行分块向量化，每块向量归一化后立即加入索引、元数据同步写入文件，
+        除索引本身外，向量只在内存中保留一个块
+        
         Args:
             database (str): 数据库名称
             page_size (int): 字段分页大小，默认100
-            embedding_batch_size (int): 向量化批次大小，默认50
+            embedding_batch_size (int): 每批最多文本数，默认2048（接口上限），批次大小主要由token预算决定
             show_progress (bool): 是否显示进度，默认True
             
         Returns:
@@ -369,75 +674,64 @@ class VectorizedFieldManager:
         
         self._log_info(f"Processing {len(fields)} fields for database {database}")
         
-        # 分批处理向量化以控制内存使用
-        all_embeddings = []
-        all_texts = []
-        
-        # 计算总批次数
-        total_batches = (len(fields) + embedding_batch_size - 1) // embedding_batch_size
+        index = self.create_faiss_index()
+        index_path = self.vector_dir / f"faiss_index_{database}.bin"
+        metadata_path = self.vector_dir / f"metadata_{database}.jsonl"
+        # 先写入临时文件，全部完成后再替换，中途失败不会留下与索引不一致的元数据
+        metadata_tmp_path = metadata_path.with_name(metadata_path.name + ".tmp")
         
         # 使用tqdm显示向量化进度
-        batch_range = range(0, len(fields), embedding_batch_size)
-        if show_progress:
-            batch_range = tqdm(batch_range, desc=f"向量化 {database}", unit="批次", total=total_batches)
-        
-        for i in batch_range:
-            batch_fields = fields[i:i + embedding_batch_size]
-            batch_texts = [self.format_field_for_vectorization(field) for field in batch_fields]
-            
-            # 获取当前批次的向量
-            batch_embeddings = self.get_embeddings(batch_texts)
-            if not batch_embeddings:
-                batch_num = i // embedding_batch_size + 1
-                logging.error(f"Failed to generate embeddings for batch {batch_num} of database {database}")
-                return False
-            
-            all_embeddings.extend(batch_embeddings)
-            all_texts.extend(batch_texts)
-            
-            # 更新进度条描述
-            if show_progress:
-                batch_range.set_postfix({
-                    '已处理': len(all_embeddings),
-                    '总计': len(fields)
-                })
-        
-        # 构建索引
-        index = self.build_faiss_index(all_embeddings)
+        progress = _progress_bar(total=len(fields), desc=f"向量化 {database}", unit="字段") if show_progress else None
+        try:
+            with open(metadata_tmp_path, "wb") as metadata_file:
+                for start in range(0, len(fields), _INDEX_ADD_CHUNK_ROWS):
+                    chunk_fields = fields[start:start + _INDEX_ADD_CHUNK_ROWS]
+                    chunk_texts = self.format_fields_for_vectorization(chunk_fields)
+                    
+                    chunk_embeddings = self.embed_texts(chunk_texts, embedding_batch_size, progress)
+                    if chunk_embeddings is None:
+                        logging.error(f"Failed to generate embeddings for database {database}")
+                        return False
+                    index.add(chunk_embeddings)
+                    
+                    # 保存元数据
+                    lines = [
+                        _dumps_json_line({
+                            'vector_index': start + i,
+                            'field_id': field['id'],
+                            'field_name': field['name'],
+                            'field_type': field['type'],
+                            'table': field['table'],
+                            'database': field['database'],
+                            'schema': field.get('schema', ''),
+                            'description': field['description'],
+                            'vectorization_text': chunk_texts[i]
+                        })
+                        for i, field in enumerate(chunk_fields)
+                    ]
+                    metadata_file.write(b"\n".join(lines) + b"\n")
+        finally:
+            if progress is not None:
+                progress.close()
+            if index.ntotal != len(fields):
+                metadata_tmp_path.unlink(missing_ok=True)
         
         # 保存索引文件
-        index_path = self.vector_dir / f"faiss_index_{database}.bin"
         faiss.write_index(index, str(index_path))
+        os.replace(metadata_tmp_path, metadata_path)
         
-        # 保存元数据
-        metadata_path = self.vector_dir / f"metadata_{database}.jsonl"
-        with open(metadata_path, 'w', encoding='utf-8') as f:
-            for i, field in enumerate(fields):
-                metadata = {
-                    'vector_index': i,
-                    'field_id': field['id'],
-                    'field_name': field['name'],
-                    'field_type': field['type'],
-                    'table': field['table'],
-                    'database': field['database'],
-                    'schema': field.get('schema', ''),
-                    'description': field['description'],
-                    'vectorization_text': all_texts[i]
-                }
-                f.write(json.dumps(metadata, ensure_ascii=False) + '\n')
-        
-        self._log_info(f"Successfully saved vectors for database {database}")
+        self._log_info(f"Successfully saved {index.ntotal} vectors for database {database}")
         return True
     
     def vectorize_database(self, database_name: str, page_size: int = 100, 
-                         embedding_batch_size: int = 50, show_progress: bool = True) -> bool:
+                         embedding_batch_size: int = 2048, show_progress: bool = True) -> bool:
         """
         为指定数据库生成向量索引
         
         Args:
             database_name (str): 数据库名称
             page_size (int): 字段分页大小，默认100
-            embedding_batch_size (int): 向量化批次大小，默认50
+            embedding_batch_size (int): 每批最多文本数，默认2048（接口上限），批次大小主要由token预算决定
             show_progress (bool): 是否显示进度，默认True
             
         Returns:
@@ -445,28 +739,36 @@ class VectorizedFieldManager:
         """
         self._log_info(f"Starting vectorization for database: {database_name}")
         
-        # 检查数据库是否存在
-        databases = self.get_database_list()
-        if database_name not in databases:
+        # 按 Field.database 建索引后，单库字段计数和分页都只读取该库的字段
+        self.cypher_executor.ensure_indexes()
+        
+        # 检查数据库是否存在：只统计该库的字段数，不再扫描全部字段获取数据库列表
+        if self.get_database_field_count(database_name) == 0:
+            # 仅在数据库不存在时才获取列表，用于错误提示
+            databases = self.get_database_list()
             logging.error(f"Database {database_name} not found. Available databases: {databases}")
             return False
         
         return self.save_database_vectors(database_name, page_size, embedding_batch_size, show_progress)
     
-    def vectorize_all_databases(self, page_size: int = 100, embedding_batch_size: int = 50, 
-                              show_progress: bool = True) -> bool:
+    def vectorize_all_databases(self, page_size: int = 100, embedding_batch_size: int = 2048, 
+                              show_progress: bool = True, database_concurrency: int = 4) -> bool:
         """
         为所有数据库生成向量索引
         
+        多个数据库并发处理，同时进行的向量化请求数最多为 database_concurrency * embedding_concurrency
+        
         Args:
             page_size (int): 字段分页大小，默认100
-            embedding_batch_size (int): 向量化批次大小，默认50
+            embedding_batch_size (int): 每批最多文本数，默认2048（接口上限），批次大小主要由token预算决定
             show_progress (bool): 是否显示进度，默认True
+            database_concurrency (int): 同时处理的数据库数，默认4
         
         Returns:
             bool: 是否全部成功
         """
         self._log_info("Starting vectorization for all databases")
+        self.cypher_executor.ensure_indexes()
         
         # 获取数据库列表
         databases = self.get_database_list()
@@ -478,24 +780,32 @@ class VectorizedFieldManager:
         success_count = 0
         total_count = len(databases)
         
-        # 使用tqdm显示数据库处理进度
-        db_iter = databases
-        if show_progress:
-            db_iter = tqdm(databases, desc="全量向量化", unit="数据库")
-        
-        for database in db_iter:
-            try:
-                if self.save_database_vectors(database, page_size, embedding_batch_size, show_progress):
-                    success_count += 1
-                    if show_progress:
-                        db_iter.set_postfix({
-                            '成功': success_count,
-                            '当前': database[:15] + '...' if len(database) > 15 else database
-                        })
-                else:
-                    logging.error(f"Failed to vectorize database: {database}")
-            except Exception as e:
-                logging.error(f"Exception during vectorization of database {database}: {e}")
+        with ThreadPoolExecutor(max_workers=max(1, min(database_concurrency, total_count))) as executor:
+            # 并发处理时各数据库内部不再显示进度条，避免多个进度条交错输出
+            futures = {
+                executor.submit(self.save_database_vectors, database, page_size, embedding_batch_size, False): database
+                for database in databases
+            }
+            
+            # 使用tqdm显示数据库处理进度
+            db_iter = as_completed(futures)
+            if show_progress:
+                db_iter = _progress_bar(db_iter, desc="全量向量化", unit="数据库", total=total_count)
+            
+            for future in db_iter:
+                database = futures[future]
+                try:
+                    if future.result():
+                        success_count += 1
+                        if show_progress:
+                            db_iter.set_postfix({
+                                '成功': success_count,
+                                '当前': database[:15] + '...' if len(database) > 15 else database
+                            }, refresh=False)
+                    else:
+                        logging.error(f"Failed to vectorize database: {database}")
+                except Exception as e:
+                    logging.error(f"Exception during vectorization of database {database}: {e}")
         
         if show_progress:
             print(f"\n全量向量化完成: {success_count}/{total_count} 个数据库成功")
@@ -503,15 +813,17 @@ class VectorizedFieldManager:
         self._log_info(f"Vectorization completed: {success_count}/{total_count} databases successful")
         return success_count == total_count
     
-    def load_database_index(self, database: str) -> Tuple[Optional[faiss.IndexFlatIP], Optional[List[Dict]]]:
+    def load_database_index(self, database: str) -> Tuple[Optional[faiss.Index], Optional[List[Dict]]]:
         """
         加载指定数据库的向量索引和元数据
         
+        同一数据库重复检索时复用已加载的索引和元数据（调用方不应修改返回的元数据）
+        
         Args:
             database (str): 数据库名称
             
         Returns:
-            Tuple[Optional[faiss.IndexFlatIP], Optional[List[Dict]]]: 索引和元数据
+            Tuple[Optional[faiss.Index], Optional[List[Dict]]]: 索引和元数据
         """
         index_path = self.vector_dir / f"faiss_index_{database}.bin"
         metadata_path = self.vector_dir / f"metadata_{database}.jsonl"
@@ -521,23 +833,33 @@ class VectorizedFieldManager:
             return None, None
         
         try:
-            # 加载索引
-            index = faiss.read_index(str(index_path))
-            
-            # 加载元数据
-            metadata = []
-            with open(metadata_path, 'r', encoding='utf-8') as f:
-                for line in f:
-                    metadata.append(json.loads(line.strip()))
-            
-            self._log_info(f"Loaded index for database {database}: {index.ntotal} vectors")
-            return index, metadata
+            return self._load_index_cached(
+                database, index_path.stat().st_mtime_ns, metadata_path.stat().st_mtime_ns
+            )
             
         except Exception as e:
             logging.error(f"Failed to load index for database {database}: {e}")
             return None, None
     
-    def search_fields(self, query: str, database: str, top_k: int = 5) -> List[Dict]:
+    def _read_database_index(self, database: str, index_mtime: int,
+                             metadata_mtime: int) -> Tuple[faiss.Index, List[Dict]]:
+        """读取索引和元数据文件（修改时间只用作缓存键）"""
+        index_path = self.vector_dir / f"faiss_index_{database}.bin"
+        metadata_path = self.vector_dir / f"metadata_{database}.jsonl"
+        
+        # 加载索引（IVF类索引的倒排数据以内存映射方式按需读取，其他索引类型忽略该标志）
+        index = faiss.read_index(str(index_path), faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        
+        # 加载元数据（整个文件一次读入后逐行解析）
+        metadata = [
+            _loads_json_line(line) for line in metadata_path.read_bytes().splitlines() if line.strip()
+        ]
+        
+        self._log_info(f"Loaded index for database {database}: {index.ntotal} vectors")
+        return index, metadata
+    
+    def search_fields(self, query: str, database: str, top_k: int = 5,
+                      ef_search: Optional[int] = None) -> List[Dict]:
         """
         在指定数据库中搜索相关字段
         
@@ -545,6 +867,7 @@ class VectorizedFieldManager:
             query (str): 查询文本
             database (str): 数据库名称
             top_k (int): 返回结果数量
+            ef_search (int, optional): HNSW检索时的候选集大小，越大召回率越高、速度越慢
             
         Returns:
             List[Dict]: 搜索结果
@@ -555,33 +878,165 @@ class VectorizedFieldManager:
             return []
         
         # 向量化查询
-        query_embeddings = self.get_embeddings([query])
-        if not query_embeddings:
-            logging.error("Failed to generate query embedding")
+        query_vector = self.get_query_vector(query)
+        if query_vector is None:
             return []
         
-        query_vector = np.array([query_embeddings[0]], dtype=np.float32)
-        faiss.normalize_L2(query_vector)
+        results = self._search_index(index, metadata, query_vector, top_k, ef_search)
+        for rank, result in enumerate(results, 1):
+            result['rank'] = rank
         
-        # 搜索
-        scores, indices = index.search(query_vector, min(top_k, len(metadata)))
+        self._log_info(f"Found {len(results)} results for query in database {database}")
+        return results
+    
+    def search_fields_across_databases(self, query: str, databases: List[str] = None, top_k: int = 5,
+                                       ef_search: Optional[int] = None) -> List[Dict]:
+        """
+        在多个数据库中搜索相关字段并按相似度合并结果
         
-        # 格式化结果
-        results = []
-        for i, (score, idx) in enumerate(zip(scores[0], indices[0])):
-            if idx != -1:  # 有效索引
-                result = metadata[idx].copy()
-                result['similarity_score'] = float(score)
-                result['rank'] = i + 1
-                results.append(result)
+        查询只向量化一次，各数据库的索引复用已加载的缓存
         
-        self._log_info(f"Found {len(results)} results for query in database {database}")
+        Args:
+            query (str): 查询文本
+            databases (List[str], optional): 数据库列表，如果为None则搜索所有已向量化的数据库
+            top_k (int): 返回结果数量
+            ef_search (int, optional): HNSW检索时的候选集大小
+            
+        Returns:
+            List[Dict]: 搜索结果，结果中的 database 字段标明所属数据库
+        """
+        if databases is None:
+            prefix = "faiss_index_"
+            databases = sorted(path.stem[len(prefix):] for path in self.vector_dir.glob(f"{prefix}*.bin"))
+        
+        if not databases:
+            logging.error("No vectorized databases found")
+            return []
+        
+        # 向量化查询
+        query_vector = self.get_query_vector(query)
+        if query_vector is None:
+            return []
+        
+        candidates = []
+        for database in databases:
+            index, metadata = self.load_database_index(database)
+            if index is None or metadata is None:
+                continue
+            candidates.extend(self._search_index(index, metadata, query_vector, top_k, ef_search))
+        
+        # 合并各数据库的结果，保留相似度最高的 top_k 个
+        results = heapq.nlargest(top_k, candidates, key=lambda result: result['similarity_score'])
+        for rank, result in enumerate(results, 1):
+            result['rank'] = rank
+        
+        self._log_info(f"Found {len(results)} results for query across {len(databases)} databases")
         return results
     
+    def get_query_vector(self, query: str) -> Optional[np.ndarray]:
+        """
+        向量化查询文本并归一化，供内积检索使用
+        
+        Args:
+            query (str): 查询文本
+            
+        Returns:
+            Optional[np.ndarray]: 形状为 (1, embedding_dim) 的归一化查询向量，失败时返回None
+        """
+        return self.get_query_vectors([query])
+    
+    def get_query_vectors(self, queries: List[str]) -> Optional[np.ndarray]:
+        """
+        在一次请求中向量化多条查询文本并归一化
+        
+        Args:
+            queries (List[str]): 查询文本列表
+            
+        Returns:
+            Optional[np.ndarray]: 形状为 (len(queries), embedding_dim) 的归一化查询向量，失败时返回None
+        """
+        query_embeddings = self.get_embeddings(queries)
+        if not query_embeddings or len(query_embeddings) != len(queries):
+            logging.error("Failed to generate query embedding")
+            return None
+        
+        query_vectors = np.array(query_embeddings, dtype=np.float32)
+        faiss.normalize_L2(query_vectors)
+        return query_vectors
+    
+    def search_fields_batch(self, queries: List[str], database: str, top_k: int = 5,
+                            ef_search: Optional[int] = None) -> List[List[Dict]]:
+        """
+        在指定数据库中批量搜索多条查询
+        
+        所有查询只请求一次向量化接口，并在索引上一次性检索，省去逐条查询的往返和调用开销
+        
+        Args:
+            queries (List[str]): 查询文本列表
+            database (str): 数据库名称
+            top_k (int): 每条查询返回的结果数量
+            ef_search (int, optional): HNSW检索时的候选集大小
+            
+        Returns:
+            List[List[Dict]]: 与 queries 一一对应的搜索结果
+        """
+        if not queries:
+            return []
+        
+        # 加载索引
+        index, metadata = self.load_database_index(database)
+        if index is None or metadata is None:
+            return [[] for _ in queries]
+        
+        # 向量化查询
+        query_vectors = self.get_query_vectors(queries)
+        if query_vectors is None:
+            return [[] for _ in queries]
+        
+        batch_results = self._search_index_batch(index, metadata, query_vectors, top_k, ef_search)
+        for results in batch_results:
+            for rank, result in enumerate(results, 1):
+                result['rank'] = rank
+        
+        self._log_info(f"Searched {len(queries)} queries in database {database}")
+        return batch_results
+    
+    def _search_index(self, index: faiss.Index, metadata: List[Dict], query_vector: np.ndarray,
+                      top_k: int, ef_search: Optional[int] = None) -> List[Dict]:
+        """在单个索引中检索，返回按相似度降序排列的元数据副本（不含rank）"""
+        return self._search_index_batch(index, metadata, query_vector, top_k, ef_search)[0]
+    
+    def _search_index_batch(self, index: faiss.Index, metadata: List[Dict], query_vectors: np.ndarray,
+                            top_k: int, ef_search: Optional[int] = None) -> List[List[Dict]]:
+        """在单个索引中一次检索多条查询向量，返回每条查询的结果列表"""
+        # 索引在多次检索间共享，HNSW候选集大小通过检索参数传入而不修改索引本身；
+        # 候选集不能小于返回数量，旧的Flat索引没有hnsw属性
+        k = min(top_k, len(metadata))
+        if k <= 0:
+            return [[] for _ in range(len(query_vectors))]
+        if hasattr(index, 'hnsw'):
+            params = faiss.SearchParametersHNSW(efSearch=max(ef_search or index.hnsw.efSearch, k))
+            scores, indices = index.search(query_vectors, k, params=params)
+        else:
+            scores, indices = index.search(query_vectors, k)
+        
+        # 格式化结果
+        batch_results = []
+        for row_scores, row_indices in zip(scores.tolist(), indices.tolist()):
+            results = []
+            for score, idx in zip(row_scores, row_indices):
+                if idx != -1:  # 有效索引
+                    result = metadata[idx].copy()
+                    result['similarity_score'] = score
+                    results.append(result)
+            batch_results.append(results)
+        return batch_results
+    
     def close(self):
         """关闭连接"""
         if self.cypher_executor:
             self.cypher_executor.close()
+        self._embedding_cache.close()
 
 
 def test():